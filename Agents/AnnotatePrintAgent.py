@@ -1,17 +1,29 @@
 import os
-import io
+import csv
 import time
 import shutil
+import threading
+from collections import deque
 from datetime import datetime
+from concurrent.futures import TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
 import yaml
 from PyPDF2 import PdfReader, PdfWriter
-from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 import logging
+import sqlite3
 import subprocess
 
+from utils.overlay_stamp import OverlayCache
+from utils.pdf_stamp import stamp_incremental, merge_pdfs, PYMUPDF_AVAILABLE
+from utils.annotation_text import clean_internal_lot
+from utils.file_utils import FileUtils
+from utils.print_queue import PrintQueue, PrintSpooler, PrinterUnavailable
+from utils.worker_pool import WorkerPool
+
 # مكتبات لتشكيل النص العربي بشكل صحيح
 try:
     from arabic_reshaper import reshape
@@ -52,22 +64,87 @@ for fp in FONT_PATHS:
         FONT_PATH = fp
         break
 
-if FONT_PATH:
+_font_lock = threading.Lock()
+_fonts_registered = False
+
+
+def register_fonts():
+    """تسجيل الخط العربي في reportlab - مرة واحدة بس"""
+    global _fonts_registered
+    with _font_lock:
+        if _fonts_registered:
+            return
+        if FONT_PATH:
+            try:
+                pdfmetrics.registerFont(TTFont("ArabicFont", FONT_PATH))
+                logger.info(f"Font loaded: {FONT_PATH}")
+            except Exception as e:
+                logger.error(f"Error loading font: {e}")
+        else:
+            logger.error("No Arabic font found!")
+        _fonts_registered = True
+
+
+@lru_cache(maxsize=1024)
+def shape_arabic_text(text):
+    """reshape + bidi للنص - نفس النص بيرجع من الكاش (الشهادات المتكررة بنفس اللوتات)"""
+    return get_display(reshape(text))
+
+
+_worker_agent = None
+
+
+def init_annotate_worker(config_path):
+    """بيتنفذ مرة في كل worker: الخط بيتسجل مرة واحدة وكاش صفحات التعليق بيفضل طول عمر الـ worker"""
+    global _worker_agent
+    # الـ process الأساسي هو اللي بيسجل نتيجة كل شهادة
+    logging.getLogger('CertPrintAgent').setLevel(logging.CRITICAL)
+    register_fonts()
+    _worker_agent = AnnotatePrintAgent(config_path)
+
+
+def annotate_in_worker(pdf_path, annotation_text, out_pdf):
+    """
+    شغل الـ worker: الكتابة بس - بترجع (الثواني، incremental، overlay من الكاش،
+    التشكيل من الكاش، الخطأ)
+    """
+    agent = _worker_agent
+    hits = agent.overlays.stats['hits']
+    shaped = shape_arabic_text.cache_info().hits if ARABIC_SUPPORT else 0
     try:
-        pdfmetrics.registerFont(TTFont("ArabicFont", FONT_PATH))
-        logger.info(f"Font loaded: {FONT_PATH}")
+        seconds, incremental = agent.write_annotated_pdf(pdf_path, annotation_text, out_pdf)
     except Exception as e:
-        logger.error(f"Error loading font: {e}")
-else:
-    logger.error("No Arabic font found!")
+        return None, False, False, False, str(e)
+    shaping_hit = ARABIC_SUPPORT and shape_arabic_text.cache_info().hits > shaped
+    return seconds, incremental, agent.overlays.stats['hits'] > hits, shaping_hit, None
 
 
 class AnnotatePrintAgent:
     def __init__(self, config_path="config.yaml"):
+        self.config_path = config_path
         self.config = self.load_config(config_path)
         self.printer_name = self.config.get('printing', {}).get('printer_name', '')
         self.retry_attempts = self.config.get('printing', {}).get('retry_attempts', 3)
         self.retry_delay = self.config.get('printing', {}).get('retry_delay_seconds', 10)
+        annotation_config = self.config.get('annotation', {})
+        self.overlays = OverlayCache(annotation_config.get('overlay_cache_size', 256))
+        # incremental: الصفحة الأولى بس بتتعدل (PyMuPDF)، rewrite: PyPDF2 بيكتب الملف كله
+        self.incremental = annotation_config.get('engine', 'incremental') == 'incremental' and PYMUPDF_AVAILABLE
+        self.annotate_stats = {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'incremental': 0}
+        self.reserved_paths = set()
+        # الكتابة في processes للدفعات الكبيرة - الطباعة بتفضل هنا واحدة واحدة
+        self.workers = annotation_config.get('workers', 0)
+        self.parallel_min_batch = annotation_config.get('parallel_min_batch', 20)
+        self.worker_timeout = annotation_config.get('timeout_seconds', 120)
+        self.pool = None
+        # التشكيل العربي اللي اتعمل في الـ workers (الكاش بتاعه في كل worker لوحده)
+        self.worker_shaping = {'hits': 0, 'misses': 0}
+        # طابور الطباعة بيشتغل لما الـ orchestrator يشغل الـ spooler - من غيره الطباعة inline زي الأول
+        self.print_queue = None
+        self.spooler = None
+        # طباعة الدفعة: شهادات الدورة في ملف واحد (أو كام ملف) بأمر طباعة واحد
+        self.batch_print = False
+        self.batch_size = 1
         self.setup_paths()
         
     def load_config(self, config_path):
@@ -88,23 +165,80 @@ class AnnotatePrintAgent:
         self.cert_inbox = os.path.join(base_dir, paths_config.get('cert_inbox', 'InPut/Cert_Inbox'))
         # مجلد جديد للشهادات اللي ملقتش في Excel
         self.not_found_dir = os.path.join(base_dir, 'OutPut', 'Not_Founded_In_Excel')
+        self.batch_dir = os.path.join(base_dir, self.config.get('printing', {}).get('batch_dir', 'OutPut/Print_Batches'))
         
         for d in [self.source_cert_dir, self.annotated_dir, self.printed_dir, self.not_found_dir]:
             os.makedirs(d, exist_ok=True)
     
+    def warm_up(self):
+        """تجهيز الخط والطابعة في الخلفية قبل أول شهادة - بترجع الوقت اللي خدته"""
+        start = time.perf_counter()
+        register_fonts()
+        self.is_printer_available()
+        return time.perf_counter() - start
+    
     def prepare_arabic_text(self, text):
         """تحضير النص العربي للطباعة بشكل صحيح"""
         if not ARABIC_SUPPORT:
             return text
         
         try:
-            reshaped_text = reshape(text)
-            bidi_text = get_display(reshaped_text)
-            return bidi_text
+            return shape_arabic_text(text)
         except Exception as e:
             logger.warning(f"Error preparing Arabic text: {e}")
             return text
     
+    def annotated_path(self, pdf_path, is_not_found=False):
+        """اسم الملف المكتوب عليه - بيتحدد هنا (بترتيب الشهادات) حتى لو الكتابة في worker"""
+        filename = os.path.basename(pdf_path)
+        base_name, ext = os.path.splitext(filename)
+        timestamp = datetime.now().strftime("%d-%b-%y_%H%M%S")
+        
+        if is_not_found:
+            out_dir, name = self.not_found_dir, f"{base_name}_NOT_FOUND_{timestamp}"
+        else:
+            out_dir, name = self.annotated_dir, f"{base_name}_ANNOTATED_{timestamp}"
+        
+        # نفس الاسم في نفس الثانية (شهادتين بنفس اسم الملف) - الملف لسه ممكن ميكونش اتكتب
+        out_pdf = os.path.join(out_dir, f"{name}{ext}")
+        counter = 1
+        while out_pdf in self.reserved_paths or os.path.exists(out_pdf):
+            out_pdf = os.path.join(out_dir, f"{name}_{counter}{ext}")
+            counter += 1
+        self.reserved_paths.add(out_pdf)
+        return out_pdf
+    
+    def write_annotated_pdf(self, pdf_path, annotation_text, out_pdf):
+        """الكتابة نفسها - بترجع (الثواني، incremental ولا لأ) وبترمي exception لو فشلت"""
+        register_fonts()
+        
+        if ARABIC_SUPPORT:
+            full_text_display = self.prepare_arabic_text(annotation_text)
+        else:
+            full_text_display = annotation_text
+        
+        # نفس النص ← نفس صفحة التعليق من الكاش
+        font = "ArabicFont" if FONT_PATH else "Helvetica"
+        style = (full_text_display, font, 17, (0.6, 0.6, 0.6), (0, 0, 0), A4)
+        
+        start = time.perf_counter()
+        stamped = False
+        if self.incremental:
+            try:
+                stamped = stamp_incremental(pdf_path, out_pdf, self.overlays.pdf_bytes(*style), A4)
+            except Exception as e:
+                logger.warning(f"Incremental stamp failed ({e}) - rewriting with PyPDF2")
+        if not stamped:
+            self.write_overlay_pdf(pdf_path, out_pdf, style)
+        return time.perf_counter() - start, stamped
+    
+    def record_annotation(self, seconds, incremental):
+        self.annotate_stats['count'] += 1
+        self.annotate_stats['seconds'] += seconds
+        self.annotate_stats['max_seconds'] = max(self.annotate_stats['max_seconds'], seconds)
+        if incremental:
+            self.annotate_stats['incremental'] += 1
+    
     # AnnotatePrintAgent.py - تحسين الكتابة على PDF
     def build_annotated_pdf(self, pdf_path, annotation_text, is_not_found=False):
         """بناء PDF مع التعليقات التوضيحية"""
@@ -112,66 +246,10 @@ class AnnotatePrintAgent:
             logger.info(f"Building annotated PDF for: {os.path.basename(pdf_path)}")
             logger.info(f"Annotation text: {annotation_text}")
             
-            if ARABIC_SUPPORT:
-                full_text_display = self.prepare_arabic_text(annotation_text)
-            else:
-                full_text_display = annotation_text
-            
-            reader = PdfReader(pdf_path)
-            writer = PdfWriter()
-            
-            packet = io.BytesIO()
-            can = canvas.Canvas(packet, pagesize=A4)
-            
-            # الإعدادات
-            font = "ArabicFont" if FONT_PATH else "Helvetica"
-            size = 17
-            can.setFont(font, size)
-            
-            # حساب عرض النص
-            try:
-                text_width = pdfmetrics.stringWidth(full_text_display, font, size)
-            except:
-                text_width = len(full_text_display) * 10
-            
-            # موضع الكتابة (أعلى اليمين)
-            x_right = 580
-            y_position = 820
-            
-            # خلفية رمادية
-            can.setFillColorRGB(0.6, 0.6, 0.6)
-            padding = 10
-            can.rect(x_right - text_width - padding*2, y_position - 5, 
-                    text_width + padding*2, 30, fill=1, stroke=0)
-            
-            # النص بالأسود
-            can.setFillColorRGB(0, 0, 0)
-            can.drawRightString(x_right - padding, y_position, full_text_display)
-            
-            can.save()
-            packet.seek(0)
-            
-            overlay = PdfReader(packet)
-            page = reader.pages[0]
-            page.merge_page(overlay.pages[0])
-            writer.add_page(page)
-            
-            for i in range(1, len(reader.pages)):
-                writer.add_page(reader.pages[i])
-            
-            filename = os.path.basename(pdf_path)
-            base_name, ext = os.path.splitext(filename)
-            timestamp = datetime.now().strftime("%d-%b-%y_%H%M%S")
-            
-            if is_not_found:
-                out_pdf = os.path.join(self.not_found_dir, f"{base_name}_NOT_FOUND_{timestamp}{ext}")
-            else:
-                out_pdf = os.path.join(self.annotated_dir, f"{base_name}_ANNOTATED_{timestamp}{ext}")
-            
-            with open(out_pdf, "wb") as f:
-                writer.write(f)
-            
-            logger.info(f"✓ Annotated PDF created: {out_pdf}")
+            out_pdf = self.annotated_path(pdf_path, is_not_found)
+            seconds, incremental = self.write_annotated_pdf(pdf_path, annotation_text, out_pdf)
+            self.record_annotation(seconds, incremental)
+            logger.info(f"✓ Annotated PDF created in {seconds * 1000:.0f} ms: {out_pdf}")
             return out_pdf
             
         except Exception as e:
@@ -180,6 +258,21 @@ class AnnotatePrintAgent:
             logger.error(traceback.format_exc())
             return None
     
+    def write_overlay_pdf(self, pdf_path, out_pdf, style):
+        """الطريقة القديمة: PyPDF2 بيقرا الملف كله ويكتبه من جديد مع صفحة التعليق"""
+        reader = PdfReader(pdf_path)
+        writer = PdfWriter()
+        
+        page = reader.pages[0]
+        page.merge_page(self.overlays.page(*style))
+        writer.add_page(page)
+        
+        for i in range(1, len(reader.pages)):
+            writer.add_page(reader.pages[i])
+        
+        with open(out_pdf, "wb") as f:
+            writer.write(f)
+    
     def is_printer_available(self):
         """التحقق من توفر الطابعة"""
         if not WIN32_AVAILABLE:
@@ -389,6 +482,111 @@ class AnnotatePrintAgent:
             logger.error(f"Default print error: {e}")
             return False
     
+    def copy_to_printed(self, annotated_path):
+        try:
+            printed_name = os.path.basename(annotated_path).replace('_ANNOTATED_', '_PRINTED_')
+            printed_path = os.path.join(self.printed_dir, printed_name)
+            shutil.copy2(annotated_path, printed_path)
+            logger.info(f"Copied to printed folder: {printed_path}")
+        except Exception as e:
+            logger.error(f"Error copying to printed folder: {e}")
+    
+    @staticmethod
+    def print_sort_key(erp_result):
+        """ترتيب الشهادات في ملف الدفعة: المورد وبعدين اللوت الداخلي"""
+        found = [r for r in erp_result.get('lot_results', []) if r.get('found')]
+        if not found:
+            return ''
+        supplier = str(found[0].get('supplier') or '').strip().casefold()
+        lot = str(clean_internal_lot(str(found[0].get('internal_lot') or '')))
+        return f"{supplier}\t{lot.zfill(12) if lot.isdigit() else lot}"
+    
+    def print_batch(self, pdf_paths):
+        """
+        الشهادات في ملف واحد بنفس الترتيب وأمر طباعة واحد (SumatraPDF بيتفتح مرة
+        واحدة). بترجع (الملفات اللي اتطبعت، {الملف: الخطأ})
+        """
+        if not self.is_printer_available():
+            raise PrinterUnavailable("Printer not available")
+        
+        os.makedirs(self.batch_dir, exist_ok=True)
+        # البرامج التانية (Adobe/ShellExecute) بتقرا الملف بعد ما الأمر يرجع - بيتمسح بعد يوم
+        FileUtils.clean_temp_files(self.batch_dir, max_age_hours=24)
+        timestamp = datetime.now().strftime("%d-%b-%y_%H%M%S")
+        batch_path = os.path.join(self.batch_dir, FileUtils.create_unique_filename(
+            f"BATCH_{timestamp}_{len(pdf_paths)}", self.batch_dir, '.pdf'))
+        
+        included, errors = merge_pdfs(pdf_paths, batch_path)
+        if not included:
+            return set(), errors
+        logger.info(f"Print batch: {len(included)} certificate(s) in {os.path.basename(batch_path)}")
+        if not self.print_pdf(batch_path):
+            return set(), errors
+        return set(included), errors
+    
+    def release_print_jobs(self, min_jobs=1):
+        """
+        شهادات الدفعة تروح للطابعة: أول ما يبقى فيه دفعة كاملة (min_jobs =
+        batch_size) وفي آخر الدورة اللي فاضل
+        """
+        if self.spooler is None or not self.batch_print:
+            return
+        released = self.print_queue.release_held(min_jobs)
+        if released:
+            logger.info(f"Print queue: {released} certificate(s) released for batch printing")
+            self.spooler.wake()
+    
+    def print_spooled(self, pdf_path):
+        """محاولة واحدة من الـ spooler - الـ retry والانتظار بتوعه"""
+        if not self.is_printer_available():
+            raise PrinterUnavailable("Printer not available")
+        return self.print_pdf(pdf_path)
+    
+    def start_spooler(self):
+        """بيفتح طابور الطباعة ويبدأ يطبع اللي فاضل فيه من التشغيل اللي فات"""
+        printing_config = self.config.get('printing', {})
+        if not printing_config.get('queue', True) or self.spooler is not None:
+            return
+        base_dir = self.config.get('paths', {}).get('base_dir', '.')
+        db_path = os.path.join(base_dir, printing_config.get('queue_db', 'print_queue.db'))
+        try:
+            self.print_queue = PrintQueue(db_path, base_dir)
+        except sqlite3.Error as e:
+            logger.error(f"Print queue disabled, printing inline: {e}")
+            return
+        self.print_queue.prune(printing_config.get('queue_keep_days', 30))
+        
+        waiting = self.print_queue.counts().get('queued', 0)
+        if waiting:
+            logger.info(f"Print queue: {waiting} job(s) waiting from the last run")
+        self.batch_size = printing_config.get('batch_max_certificates', 1) if PYMUPDF_AVAILABLE else 1
+        self.batch_print = self.batch_size > 1
+        self.spooler = PrintSpooler(
+            self.print_queue, self.print_spooled, on_printed=self.copy_to_printed,
+            max_attempts=printing_config.get('queue_max_attempts', 6),
+            backoff_seconds=printing_config.get('queue_backoff_seconds', 10),
+            max_backoff_seconds=printing_config.get('queue_max_backoff_seconds', 600),
+            print_batch=self.print_batch, batch_size=self.batch_size,
+        )
+        self.spooler.start()
+    
+    def stop_spooler(self, drain_seconds=0):
+        """drain_seconds: استنى الأوامر الجاهزة تتطبع الأول (run_once) - اللي فاضل بيتطبع التشغيل الجاي"""
+        if self.spooler is None:
+            return
+        if drain_seconds and not self.spooler.wait_idle(drain_seconds):
+            if self.spooler.paused:
+                waiting = self.print_queue.counts().get('queued', 0)
+                logger.warning(f"Printer not available - {waiting} job(s) held in the print queue will print on the next run")
+            else:
+                logger.warning(f"Print queue still busy after {drain_seconds}s - the rest prints on the next start")
+        self.spooler.stop(timeout=5)
+        counts = self.print_queue.counts()
+        logger.info(f"Print queue: {counts.get('queued', 0)} waiting, {counts.get('failed', 0)} failed")
+        if not self.spooler.is_alive():
+            self.print_queue.close()
+        self.spooler = None
+    
     def print_with_retry(self, pdf_path):
         """محاولة الطباعة مع إعادة المحاولة"""
         for attempt in range(self.retry_attempts):
@@ -421,40 +619,99 @@ class AnnotatePrintAgent:
         
         return None
     
+    def write_not_found_report(self, erp_result, annotated_path):
+        """
+        سطر لكل لوت مش موجود في not_found_report.csv جوه فولدر Not_Founded_In_Excel
+        ومعاه اللوتات القريبة اللي ممكن تكون هي المقصودة
+        """
+        report_path = os.path.join(self.not_found_dir, 'not_found_report.csv')
+        try:
+            new_file = not os.path.exists(report_path)
+            timestamp = datetime.now().isoformat(timespec='seconds')
+            with open(report_path, 'a', newline='', encoding='utf-8-sig') as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(['timestamp', 'cert_number', 'file_name', 'cert_lot', 'suggestions', 'annotated_pdf'])
+                for lot_result in erp_result.get('lot_results', []):
+                    if lot_result.get('found'):
+                        continue
+                    suggestions = "; ".join(
+                        f"{s['cert_lot']} ({s['sheet']}: {s['supplier']} - {s['internal_lot']})"
+                        for s in lot_result.get('suggestions', [])
+                    )
+                    writer.writerow([
+                        timestamp,
+                        erp_result.get('cert_number', 'UNKNOWN'),
+                        erp_result.get('file_name', ''),
+                        lot_result.get('cert_lot', ''),
+                        suggestions,
+                        os.path.basename(annotated_path),
+                    ])
+        except Exception as e:
+            logger.error(f"Error writing not-found report: {e}")
+    
     def process_certificate(self, erp_result):
         """معالجة شهادة واحدة"""
         try:
-            cert_number = erp_result.get('cert_number', 'UNKNOWN')
-            annotation_text = erp_result.get('annotation_text', '')
-            file_path = erp_result.get('file_path', '')
-            file_name = erp_result.get('file_name', '')
-            all_found = erp_result.get('all_found', False)
-            lot_results = erp_result.get('lot_results', [])
-            
-            # التحقق لو ملقتش في Excel
-            is_not_found = not all_found or not any(r.get('found') for r in lot_results)
-            
-            logger.info(f"\\n{'='*50}")
-            logger.info(f"Processing certificate: {cert_number}")
-            logger.info(f"File: {file_name}")
-            logger.info(f"Annotation: {annotation_text}")
-            logger.info(f"Found in Excel: {not is_not_found}")
-            logger.info(f"{'='*50}")
-            
-            # البحث عن ملف PDF
-            if file_path and os.path.exists(file_path):
-                pdf_path = file_path
-            else:
-                pdf_path = self.find_pdf_file(file_name)
-            
-            if not pdf_path or not os.path.exists(pdf_path):
-                logger.error(f"PDF not found: {file_name}")
-                return {'success': False, 'printed': False, 'error': 'File not found'}
-            
-            logger.info(f"Found PDF: {pdf_path}")
+            job, error = self.prepare_certificate(erp_result)
+            if job is None:
+                return error
             
             # إنشاء PDF مكتوب عليه
-            annotated_path = self.build_annotated_pdf(pdf_path, annotation_text, is_not_found)
+            annotated_path = self.build_annotated_pdf(job['pdf_path'], job['annotation_text'], job['is_not_found'])
+            return self.finish_certificate(job, annotated_path)
+            
+        except Exception as e:
+            logger.error(f"Error processing certificate: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return {'success': False, 'printed': False, 'error': str(e)}
+    
+    def prepare_certificate(self, erp_result):
+        """الملف الأصلي للشهادة - بترجع (job, None) أو (None, نتيجة الفشل)"""
+        cert_number = erp_result.get('cert_number', 'UNKNOWN')
+        annotation_text = erp_result.get('annotation_text', '')
+        file_path = erp_result.get('file_path', '')
+        file_name = erp_result.get('file_name', '')
+        all_found = erp_result.get('all_found', False)
+        lot_results = erp_result.get('lot_results', [])
+        
+        # التحقق لو ملقتش في Excel
+        is_not_found = not all_found or not any(r.get('found') for r in lot_results)
+        
+        logger.info(f"\\n{'='*50}")
+        logger.info(f"Processing certificate: {cert_number}")
+        logger.info(f"File: {file_name}")
+        logger.info(f"Annotation: {annotation_text}")
+        logger.info(f"Found in Excel: {not is_not_found}")
+        logger.info(f"{'='*50}")
+        
+        # البحث عن ملف PDF
+        if file_path and os.path.exists(file_path):
+            pdf_path = file_path
+        else:
+            pdf_path = self.find_pdf_file(file_name)
+        
+        if not pdf_path or not os.path.exists(pdf_path):
+            logger.error(f"PDF not found: {file_name}")
+            return None, {'success': False, 'printed': False, 'error': 'File not found'}
+        
+        logger.info(f"Found PDF: {pdf_path}")
+        return {
+            'erp_result': erp_result,
+            'cert_number': cert_number,
+            'annotation_text': annotation_text,
+            'pdf_path': pdf_path,
+            'is_not_found': is_not_found,
+        }, None
+    
+    def finish_certificate(self, job, annotated_path):
+        """بعد الكتابة: اللي ملقتش في Excel بيتحفظ بس والباقي بيتطبع، والأصل للأرشيف"""
+        erp_result = job['erp_result']
+        cert_number = job['cert_number']
+        pdf_path = job['pdf_path']
+        is_not_found = job['is_not_found']
+        try:
             if not annotated_path:
                 logger.error("Failed to create annotated PDF")
                 return {'success': False, 'printed': False, 'error': 'Annotation failed'}
@@ -462,6 +719,7 @@ class AnnotatePrintAgent:
             # لو ملقتش في Excel، ماتطبعش، حفظ بس
             if is_not_found:
                 logger.warning(f"⚠ Certificate NOT FOUND in Excel - saved to: {self.not_found_dir}")
+                self.write_not_found_report(erp_result, annotated_path)
                 
                 # نقل الملف الأصلي للأرشيف برضه
                 try:
@@ -488,7 +746,17 @@ class AnnotatePrintAgent:
             
             # محاولة الطباعة (للشهادات اللي اتلقت في Excel)
             printed = False
-            if self.is_printer_available():
+            queued = False
+            if self.spooler is not None:
+                job_id = self.print_queue.enqueue(annotated_path, cert_number, self.print_sort_key(erp_result),
+                                                  hold=self.batch_print)
+                if self.batch_print:
+                    self.release_print_jobs(self.batch_size)
+                else:
+                    self.spooler.wake()
+                queued = True
+                logger.info(f"Queued for printing (job {job_id})")
+            elif self.is_printer_available():
                 printed = self.print_with_retry(annotated_path)
                 if printed:
                     logger.info("✓✓✓ Certificate printed successfully! ✓✓✓")
@@ -514,17 +782,12 @@ class AnnotatePrintAgent:
             
             # لو اتطبع، انسخ للمجلد المطبوع
             if printed:
-                try:
-                    printed_name = os.path.basename(annotated_path).replace('_ANNOTATED_', '_PRINTED_')
-                    printed_path = os.path.join(self.printed_dir, printed_name)
-                    shutil.copy2(annotated_path, printed_path)
-                    logger.info(f"Copied to printed folder: {printed_path}")
-                except Exception as e:
-                    logger.error(f"Error copying to printed folder: {e}")
+                self.copy_to_printed(annotated_path)
             
             return {
                 'success': True,
                 'printed': printed,
+                'queued': queued,
                 'not_found': False,
                 'annotated_path': annotated_path,
                 'cert_number': cert_number
@@ -546,35 +809,152 @@ class AnnotatePrintAgent:
         logger.info(f"Processing {len(erp_results)} certificate(s)")
         logger.info(f"{'='*60}")
         
+        return self.process_stream(erp_results, total=len(erp_results))
+    
+    def process_stream(self, erp_results, total=None):
+        """
+        كل شهادة بتتعلم وتتطبع أول ما توصل - erp_results ممكن تكون generator
+        (ERPAgent.iter_results) فأول طباعة مش مستنية آخر شهادة تتقري
+        """
         results = {
-            'total': len(erp_results),
+            'total': 0,
             'printed': 0,
             'not_found': 0,
             'annotated_only': 0,
+            'queued': 0,
             'failed': 0,
+            'first_seconds': None,
             'details': []
         }
         
-        for i, erp_result in enumerate(erp_results, 1):
-            logger.info(f"\\n--- Certificate {i}/{len(erp_results)} ---")
-            result = self.process_certificate(erp_result)
+        self.reserved_paths.clear()  # ملفات الدفعات اللي فاتت موجودة على الديسك خلاص
+        # total = None (streaming): الدفعة ممكن تكون كبيرة فالـ pool بيشتغل لو موجود
+        parallel = self.workers > 1 and (total is None or total >= self.parallel_min_batch)
+        processed = self.process_parallel(erp_results, total) if parallel else self.process_sequential(erp_results, total)
+        
+        start = time.perf_counter()
+        try:
+            self.count_results(processed, results, start)
+        finally:
+            self.release_print_jobs()
+        
+        if not results['total']:
+            return results
+        
+        logger.info(f"\\n{'='*60}")
+        logger.info(f"Summary: {results['printed']} printed, {results['queued']} queued for printing, {results['not_found']} not found, {results['annotated_only']} annotated, {results['failed']} failed")
+        logger.info(f"First certificate done after {results['first_seconds']:.2f}s, "
+                    f"all {results['total']} after {time.perf_counter() - start:.2f}s")
+        self.log_annotation_stats()
+        if ARABIC_SUPPORT:
+            info = shape_arabic_text.cache_info()
+            logger.info(f"Arabic shaping cache: {info.hits + self.worker_shaping['hits']} hit(s), "
+                        f"{info.misses + self.worker_shaping['misses']} miss(es)")
+        logger.info(f"{'='*60}")
+        
+        return results
+    
+    def count_results(self, processed, results, start):
+        for i, result in enumerate(processed, 1):
+            results['total'] = i
             results['details'].append(result)
+            if results['first_seconds'] is None:
+                results['first_seconds'] = time.perf_counter() - start
             
             if result.get('success'):
                 if result.get('not_found'):
                     results['not_found'] += 1
                 elif result.get('printed'):
                     results['printed'] += 1
+                elif result.get('queued'):
+                    results['queued'] += 1
                 else:
                     results['annotated_only'] += 1
             else:
                 results['failed'] += 1
+    
+    def process_sequential(self, erp_results, total=None):
+        for i, erp_result in enumerate(erp_results, 1):
+            logger.info(f"\\n--- Certificate {i}/{total or '?'} ---")
+            yield self.process_certificate(erp_result)
+    
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = WorkerPool(self.workers, self.worker_timeout, initializer=init_annotate_worker,
+                                   initargs=(self.config_path,))
+        return self.pool
+    
+    def reset_pool(self):
+        """الـ workers بيتقفلوا (حتى لو معلقين في شهادة) - pool جديد للشهادات الجاية"""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+    
+    def process_parallel(self, erp_results, total=None):
+        """
+        الكتابة في الـ pool وكل الباقي هنا: أسماء الملفات بتتحدد بترتيب
+        الشهادات، والطباعة والأرشفة بتتعمل واحدة واحدة بنفس الترتيب - فالنتايج
+        زي الطريقة العادية بالظبط والطابعة مش بتاخد أمرين في نفس الوقت
+        """
+        window = deque()
+        for i, erp_result in enumerate(erp_results, 1):
+            logger.info(f"\\n--- Certificate {i}/{total or '?'} ---")
+            try:
+                job, error = self.prepare_certificate(erp_result)
+                if job is not None:
+                    job['out_pdf'] = self.annotated_path(job['pdf_path'], job['is_not_found'])
+                    job['future'] = self.get_pool().submit(annotate_in_worker, job['pdf_path'],
+                                                           job['annotation_text'], job['out_pdf'])
+            except Exception as e:
+                logger.error(f"Error processing certificate: {e}")
+                job, error = None, {'success': False, 'printed': False, 'error': str(e)}
+            window.append((job, error))
+            if self.pool is not None:
+                self.pool.poll()
+            
+            # أول الطابور اللي خلص بيطلع على طول، ومش أكتر من ضعف عدد الـ workers مستنيين
+            while window and (len(window) > self.workers * 2 or window[0][0] is None
+                              or window[0][0]['future'].done()):
+                yield self.complete_certificate(*window.popleft())
         
-        logger.info(f"\\n{'='*60}")
-        logger.info(f"Summary: {results['printed']} printed, {results['not_found']} not found, {results['annotated_only']} annotated, {results['failed']} failed")
-        logger.info(f"{'='*60}")
+        while window:
+            yield self.complete_certificate(*window.popleft())
+    
+    def complete_certificate(self, job, error):
+        """نتيجة الـ worker ← نفس باقي الخطوات بتاعة process_certificate"""
+        if job is None:
+            return error
         
-        return results
+        # الـ pool بيعيد الشهادات اللي وقعت مع شهادة تانية في pool جديد - اللي
+        # وقعت الـ worker أو علقت هي بس اللي بتفشل (ومش بتتكتب هنا في البرنامج نفسه)
+        overlay_hit = shaping_hit = False
+        try:
+            seconds, incremental, overlay_hit, shaping_hit, failure = self.pool.result(job['future'])
+        except TimeoutError:
+            seconds, failure = None, f"Annotation timed out after {self.worker_timeout}s"
+        except BrokenProcessPool as e:
+            seconds, failure = None, f"Annotation worker crashed: {e}"
+        
+        if failure:
+            logger.error(f"Error building annotated PDF for {os.path.basename(job['pdf_path'])}: {failure}")
+            return self.finish_certificate(job, None)
+        
+        self.record_annotation(seconds, incremental)
+        self.overlays.stats['hits' if overlay_hit else 'misses'] += 1
+        if ARABIC_SUPPORT:
+            self.worker_shaping['hits' if shaping_hit else 'misses'] += 1
+        logger.info(f"✓ Annotated PDF created in {seconds * 1000:.0f} ms (worker): {job['out_pdf']}")
+        return self.finish_certificate(job, job['out_pdf'])
+    
+    def log_annotation_stats(self):
+        stats = self.annotate_stats
+        if not stats['count']:
+            return
+        overlays = self.overlays.stats
+        logger.info(f"Annotation: {stats['count']} PDF(s) ({stats['incremental']} incremental), "
+                    f"{stats['seconds'] / stats['count'] * 1000:.0f} ms avg, {stats['max_seconds'] * 1000:.0f} ms max; "
+                    f"overlay cache {overlays['hits']} hit(s), {overlays['misses']} miss(es) "
+                    f"({self.overlays.hit_rate():.0%} hit rate)")
     
     def run(self, erp_results=None):
         """تشغيل الوكيل"""
@@ -1,11 +1,15 @@
 # ERPAgent.py - معالجة كل أنماط اللوت والكتابة الصحيحة على الشهادة
-import pandas as pd
 import os
-import re
 import yaml
+import time
 from datetime import datetime
 import logging
 
+from utils.erp_backend import create_backend
+from utils.negative_cache import NegativeLotCache
+from utils.near_match import NearMatchIndex
+from utils.annotation_text import AnnotationTextEngine
+
 logger = logging.getLogger('CertPrintAgent')
 
 class ERPAgent:
@@ -18,7 +22,22 @@ class ERPAgent:
             'internal_lot': 'Lot Num.',
             'supplier': 'Supplier'
         })
-        self.excel_cache = {}
+        # مصدر البيانات: الإكسيل نفسه أو قاعدة SQLite (erp.backend)
+        self.backend = create_backend(self.config, self.excel_path, self.sheets, self.column_names)
+        self.miss_cache = NegativeLotCache()
+        self.annotation_text = AnnotationTextEngine(
+            self.config.get('annotation', {}).get('text_cache_size', 1024)
+        )
+        # عدادات الـ routing بنطاقات الشيتات
+        self.route_stats = dict.fromkeys(
+            ['routed', 'full', 'unroutable', 'skipped', 'sheets_skipped', 'hits', 'misroutes'], 0
+        )
+        # فهرس الاقتراحات بيتبني أول مرة نحتاجه بس، لكل نسخة بيانات
+        self.near_match = None
+        self.near_match_version = None
+        suggestions = self.config.get('excel', {}).get('suggestions', {})
+        self.suggest_max_distance = suggestions.get('max_distance', 2)
+        self.suggest_limit = suggestions.get('limit', 5)
         
     def load_config(self, config_path):
         try:
@@ -33,68 +52,45 @@ class ERPAgent:
         erp_file = self.config.get('paths', {}).get('erp_file', 'Raw_Warehouses.xlsx')
         return os.path.join(base_dir, erp_file)
     
-    def load_excel_sheet(self, sheet_name):
-        try:
-            if sheet_name in self.excel_cache:
-                return self.excel_cache[sheet_name]
-            
-            logger.info(f"Loading sheet: {sheet_name}")
-            df = pd.read_excel(self.excel_path, sheet_name=sheet_name)
-            df.columns = df.columns.str.strip()
-            
-            required = [
-                self.column_names.get('cert_lot', 'NO'),
-                self.column_names.get('internal_lot', 'Lot Num.'),
-                self.column_names.get('supplier', 'Supplier')
-            ]
-            
-            missing = [col for col in required if col not in df.columns]
-            if missing:
-                logger.warning(f"Missing columns in {sheet_name}: {missing}")
-                return None
-            
-            cert_col = self.column_names.get('cert_lot', 'NO')
-            # تنظيف الأرقام
-            df[cert_col] = df[cert_col].astype(str).str.strip().str.replace('.0', '', regex=False)
-            
-            self.excel_cache[sheet_name] = df
-            logger.info(f"Sheet {sheet_name} loaded: {len(df)} rows")
-            return df
-            
-        except Exception as e:
-            logger.error(f"Error loading sheet {sheet_name}: {e}")
-            return None
+    def refresh_if_changed(self):
+        """تحديث بيانات الـ backend لو المصدر اتغير - بترجع True لو النسخة اتغيرت"""
+        return self.backend.refresh()
+    
+    def warm_up(self):
+        """تحميل بيانات الـ ERP في الخلفية - بترجع الوقت اللي خدته"""
+        start = time.perf_counter()
+        self.refresh_if_changed()
+        return time.perf_counter() - start
     
-    def search_lot_in_sheet(self, cert_lot_number, sheet_name):
+    def import_database(self):
+        """import ملف الإكسيل كله في قاعدة SQLite (erp.sqlite_path)"""
+        backend = create_backend(self.config, self.excel_path, self.sheets, self.column_names, backend='sqlite')
         try:
-            df = self.load_excel_sheet(sheet_name)
-            if df is None:
-                return None
-            
-            cert_col = self.column_names.get('cert_lot', 'NO')
-            lot_str = str(cert_lot_number).strip()
-            
-            # بحث مطابق تماماً
-            matches = df[df[cert_col] == lot_str]
-            
-            if not matches.empty:
-                return matches.iloc[0]
-            
-            # بحث بدون أصفار في البداية
-            matches = df[df[cert_col].str.lstrip('0') == lot_str.lstrip('0')]
-            if not matches.empty:
-                return matches.iloc[0]
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error searching in {sheet_name}: {e}")
-            return None
+            return backend.import_workbook()
+        finally:
+            backend.close()
     
-    def search_lot(self, cert_lot_number):
-        """البحث عن لوت واحد في كل الشيتات"""
-        logger.info(f"Searching ERP for lot: {cert_lot_number}")
-        
+    def get_near_match(self):
+        """فهرس الاقتراحات للنسخة الحالية من البيانات"""
+        if self.near_match is None or self.near_match_version != self.backend.version:
+            self.near_match_version = self.backend.version
+            self.near_match = NearMatchIndex(self.backend.lot_keys(), self.backend.lookup)
+        return self.near_match
+    
+    def suggest_lots(self, cert_lot_number):
+        """لوتات قريبة من لوت مش موجود (رقم غلط، رقمين متبدلين، رقم ناقص)"""
+        if self.suggest_limit <= 0:
+            return []
+        suggestions = self.get_near_match().suggest(
+            cert_lot_number, self.suggest_max_distance, self.suggest_limit
+        )
+        if suggestions:
+            summary = ", ".join(f"{s['cert_lot']} ({s['sheet']}, d={s['distance']})" for s in suggestions)
+            logger.info(f"Did you mean for {cert_lot_number}: {summary}")
+        return suggestions
+    
+    def make_lot_result(self, cert_lot_number, match):
+        """نتيجة لوت واحد بالشكل اللي باقي الـ pipeline مستنيه"""
         result = {
             'cert_lot': cert_lot_number,
             'found': False,
@@ -102,20 +98,95 @@ class ERPAgent:
             'internal_lot': None,
             'sheet_found': None
         }
+        if match is not None:
+            sheet, supplier, internal_lot = match
+            result['found'] = True
+            result['supplier'] = supplier
+            result['internal_lot'] = internal_lot
+            result['sheet_found'] = sheet
+        return result
+    
+    def lookup_lot(self, cert_lot_number):
+        """البحث في الـ backend مع كاش اللوتات الناقصة"""
+        return self.resolve_lots([cert_lot_number])[str(cert_lot_number).strip()]
+    
+    def search_lot(self, cert_lot_number):
+        """البحث عن لوت واحد في كل الشيتات"""
+        logger.info(f"Searching ERP for lot: {cert_lot_number}")
         
-        for sheet in self.sheets:
-            row = self.search_lot_in_sheet(cert_lot_number, sheet)
-            if row is not None:
-                result['found'] = True
-                result['supplier'] = str(row[self.column_names.get('supplier', 'Supplier')])
-                result['internal_lot'] = str(row[self.column_names.get('internal_lot', 'Lot Num.')])
-                result['sheet_found'] = sheet
-                logger.info(f"Found in {sheet}: Supplier={result['supplier']}, Internal Lot={result['internal_lot']}")
-                return result
-        
-        logger.warning(f"Lot {cert_lot_number} not found in ERP")
+        match = self.lookup_lot(cert_lot_number)
+        result = self.make_lot_result(cert_lot_number, match)
+        if result['found']:
+            logger.info(f"Found in {result['sheet_found']}: Supplier={result['supplier']}, Internal Lot={result['internal_lot']}")
+        else:
+            logger.warning(f"Lot {cert_lot_number} not found in ERP")
+            result['suggestions'] = self.suggest_lots(cert_lot_number)
         return result
     
+    def resolve_lots(self, lot_numbers):
+        """
+        بحث مجمّع: كل لوت مختلف بيتدور عليه مرة واحدة بس، واللوتات اللي فشلت
+        قبل كده في نفس نسخة البيانات مش بتروح للـ backend أصلاً
+        بترجع {lot: (sheet, supplier, internal_lot) أو None}
+        """
+        version, ranges = self.backend.version, self.backend.ranges
+        lots = list(dict.fromkeys(str(n).strip() for n in lot_numbers))
+        pending = [lot for lot in lots if not self.miss_cache.is_known_miss(lot, version)]
+        
+        # اللوت الرقمي اللي مفيش شيت نطاقه يغطيه أكيد مش موجود - مش محتاج بحث
+        routes = {lot: ranges.route(lot) if ranges is not None else None for lot in pending}
+        matches = {lot: None for lot in pending if routes[lot] == []}
+        matches.update(self.backend.lookup_many([lot for lot in pending if routes[lot] != []]))
+        self.count_routes(routes, matches, ranges)
+        
+        for lot, match in matches.items():
+            if match is None:
+                self.miss_cache.record_miss(lot, version)
+            else:
+                self.miss_cache.record_found(lot)
+        return {lot: matches.get(lot) for lot in lots}
+    
+    def count_routes(self, routes, matches, ranges):
+        """
+        routed: البحث ممكن يقتصر على شيتات أقل، full: النطاقات متداخلة فلازم كل الشيتات،
+        skipped: اترد عليه من غير بحث. misroutes لازم تفضل صفر - لوت اتلقى في شيت برا نطاقه
+        """
+        stats = self.route_stats
+        for lot, route in routes.items():
+            if route is None:
+                stats['unroutable'] += 1
+                continue
+            if not route:
+                stats['skipped'] += 1
+            elif len(route) < len(ranges.sheets):
+                stats['routed'] += 1
+            else:
+                stats['full'] += 1
+            stats['sheets_skipped'] += len(ranges.sheets) - len(route)
+            
+            match = matches.get(lot)
+            if match is not None:
+                if match[0] in route:
+                    stats['hits'] += 1
+                else:
+                    stats['misroutes'] += 1
+                    logger.warning(f"Lot {lot} found in {match[0]} outside its routed sheets {route}")
+    
+    def log_routing(self):
+        stats = self.route_stats
+        logger.info(f"Sheet routing: {stats['routed']} routed, {stats['full']} full walk(s), "
+                    f"{stats['skipped']} answered without lookup, {stats['unroutable']} non-numeric, "
+                    f"{stats['sheets_skipped']} sheet probe(s) skipped, {stats['hits']} hit(s), "
+                    f"{stats['misroutes']} misroute(s)")
+    
+    def log_missing_lots(self, limit=5):
+        """أكتر اللوتات الناقصة طلباً - عشان نعرف أنهي بيانات ناقصة من الـ ERP"""
+        top = self.miss_cache.most_requested(limit)
+        if top:
+            summary = ", ".join(f"{e['lot']} x{e['count']}" for e in top)
+            logger.info(f"Most requested missing lots ({len(self.miss_cache)} tracked, "
+                        f"{self.miss_cache.hits} cached answers): {summary}")
+    
     # ERPAgent.py - التأكد من البحث عن كل الأرقام
     def search_multiple_lots(self, extraction_result):
         """البحث عن كل الأرقام"""
@@ -149,92 +220,15 @@ class ERPAgent:
         """
         توليد نص التعليق للكتابة على الشهادة
         """
-        if not lot_results:
-            return "غير مسجل في النظام"
-        
-        # لو مفيش ولا واحد موجود
-        if not any(r.get('found') for r in lot_results):
-            lots_str = " - ".join([r['cert_lot'] for r in lot_results])
-            return f"غير مسجل في النظام / {lots_str} N/A"
-        
-        # تنظيف رقم اللوت الداخلي (إزالة .0)
-        def clean_internal_lot(lot_num):
-            if lot_num and isinstance(lot_num, str):
-                # إزالة .0 في النهاية
-                if lot_num.endswith('.0'):
-                    lot_num = lot_num[:-2]
-                # إزالة Lot في البداية لو موجودة
-                lot_num = re.sub(r'^Lot\s+', '', lot_num, flags=re.IGNORECASE)
-                return lot_num.strip()
-            return lot_num
-        
-        # تجميع النتائج حسب المورد
-        supplier_groups = {}
-        not_found_lots = []
-        
-        for result in lot_results:
-            if result.get('found'):
-                supplier = result.get('supplier', '').strip()
-                internal_lot = clean_internal_lot(result.get('internal_lot', ''))
-                
-                if supplier not in supplier_groups:
-                    supplier_groups[supplier] = []
-                supplier_groups[supplier].append(internal_lot)
-            else:
-                not_found_lots.append(result['cert_lot'])
-        
-        # بناء النص
-        parts = []
-        
-        # الحالة 1: مورد واحد
-        if len(supplier_groups) == 1:
-            supplier = list(supplier_groups.keys())[0]
-            lots = supplier_groups[supplier]
-            
-            if len(lots) == 1:
-                # لوط واحد أو implicit multi
-                lot_text = lots[0]
-                if annotation_hint:
-                    lot_text = f"{lot_text} {annotation_hint}"
-                # إزالة كلمة Lot لو موجودة في الاسم
-                supplier_clean = re.sub(r'^Lot\s+', '', supplier, flags=re.IGNORECASE)
-                parts.append(f"{supplier_clean} - {lot_text}")
-            else:
-                # لوطين显式 (مثل 2601 و 2602)
-                lots_text = " - ".join(lots)
-                supplier_clean = re.sub(r'^Lot\s+', '', supplier, flags=re.IGNORECASE)
-                parts.append(f"{supplier_clean} - {lots_text}")
-        
-        # الحالة 2: موردين مختلفين
-        else:
-            for supplier, lots in supplier_groups.items():
-                supplier_clean = re.sub(r'^Lot\s+', '', supplier, flags=re.IGNORECASE)
-                if len(lots) == 1:
-                    parts.append(f"{supplier_clean} - {lots[0]}")
-                else:
-                    lots_text = " - ".join(lots)
-                    parts.append(f"{supplier_clean} - {lots_text}")
-        
-        # إضافة اللوتات اللي ملقتش
-        if not_found_lots:
-            parts.append(f"{' - '.join(not_found_lots)} N/A")
-        
-        result_text = " | ".join(parts) if len(parts) > 1 else parts[0]
-        
-        # تنظيف النهائي: إزالة تكرار Lot
-        result_text = re.sub(r'\bLot\s+Lot\b', 'Lot', result_text, flags=re.IGNORECASE)
-        result_text = re.sub(r'\s+', ' ', result_text)  # إزالة المسافات الزائدة
-        
-        return result_text
+        return self.annotation_text.text(lot_results, annotation_hint)
     
-    def process_certificate(self, extraction_result):
-        cert_number = extraction_result.get('certification_number', 'UNKNOWN')
-        logger.info(f"Processing cert: {cert_number}")
-        
-        # البحث عن كل الأرقام
-        lot_results = self.search_multiple_lots(extraction_result)
-        
-        # التحقق من النتائج
+    def log_annotation_cache(self):
+        stats = self.annotation_text.stats()
+        logger.info(f"Annotation text cache: {stats['hits']} hit(s), {stats['misses']} miss(es), "
+                    f"{stats['size']}/{stats['max_size']} entries")
+    
+    def build_certificate_result(self, extraction_result, lot_results):
+        """نتيجة الشهادة اللي AnnotatePrintAgent.process_certificate بيستخدمها"""
         found_count = sum(1 for r in lot_results if r.get('found'))
         total_lots = len(lot_results)
         
@@ -242,8 +236,8 @@ class ERPAgent:
         annotation_hint = extraction_result.get('annotation_hint')
         annotation_text = self.generate_annotation_text(lot_results, annotation_hint)
         
-        result = {
-            'cert_number': cert_number,
+        return {
+            'cert_number': extraction_result.get('certification_number', 'UNKNOWN'),
             'file_path': extraction_result.get('file_path', ''),
             'file_name': extraction_result.get('file_name', ''),
             'product': extraction_result.get('product_name', 'UNKNOWN'),
@@ -255,18 +249,98 @@ class ERPAgent:
             'total_lots': total_lots,
             'processing_time': datetime.now().isoformat()
         }
+    
+    def process_certificate(self, extraction_result):
+        cert_number = extraction_result.get('certification_number', 'UNKNOWN')
+        logger.info(f"Processing cert: {cert_number}")
+        
+        # البحث عن كل الأرقام
+        lot_results = self.search_multiple_lots(extraction_result)
+        result = self.build_certificate_result(extraction_result, lot_results)
         
-        logger.info(f"ERP complete: {found_count}/{total_lots} found")
-        logger.info(f"Annotation: {annotation_text}")
+        logger.info(f"ERP complete: {result['found_count']}/{result['total_lots']} found")
+        logger.info(f"Annotation: {result['annotation_text']}")
         
         return result
     
+    def build_lot_results(self, extraction_result, matches, suggestions):
+        """نتايج لوتات شهادة واحدة من نتايج البحث المجمّع"""
+        lot_info_list = extraction_result.get('lot_info', [])
+        lot_results = []
+        for i, lot_num in enumerate(extraction_result.get('lot_numbers', [])):
+            key = str(lot_num).strip()
+            lot_result = self.make_lot_result(lot_num, matches[key])
+            if key in suggestions:
+                lot_result['suggestions'] = suggestions[key]
+            if i < len(lot_info_list):
+                info = lot_info_list[i]
+                lot_result['type'] = info.get('type', 'single')
+                lot_result['annotation_hint'] = info.get('annotation_hint')
+                lot_result['count'] = info.get('count', 1)
+            lot_results.append(lot_result)
+        return lot_results
+    
+    def process_batch(self, extraction_results):
+        """
+        كل شهادات الدورة مرة واحدة: اللوتات كلها بتتجمع من غير تكرار وبتتدور
+        في نفس نسخة البيانات، وبعدين النتايج بتتوزع على الشهادات
+        """
+        all_lots = [lot for ext in extraction_results for lot in ext.get('lot_numbers', [])]
+        matches = self.resolve_lots(all_lots)
+        
+        found = sum(1 for m in matches.values() if m is not None)
+        logger.info(f"ERP batch: {len(extraction_results)} certificate(s), {len(all_lots)} lot(s), "
+                    f"{len(matches)} unique, {found} found")
+        missing = [lot for lot, m in matches.items() if m is None]
+        suggestions = {}
+        if missing:
+            logger.warning(f"Lots not found in ERP: {missing}")
+            self.log_missing_lots()
+            suggestions = {lot: self.suggest_lots(lot) for lot in missing}
+        self.log_routing()
+        
+        results = []
+        for ext in extraction_results:
+            result = self.build_certificate_result(ext, self.build_lot_results(ext, matches, suggestions))
+            logger.info(f"{result['file_name']}: {result['found_count']}/{result['total_lots']} found -> {result['annotation_text']}")
+            results.append(result)
+        
+        self.log_annotation_cache()
+        return results
+    
     def process_all(self, extraction_results):
         logger.info(f"Processing {len(extraction_results)} certificates")
-        return [self.process_certificate(ext) for ext in extraction_results]
+        return self.process_batch(extraction_results)
+    
+    def iter_results(self, extraction_results):
+        """
+        نسخة streaming من process_batch: كل شهادة بتتدور لوتاتها أول ما توصل
+        وبتطلع على طول للطباعة. extraction_results ممكن تكون generator، واللوتات
+        المتكررة بين الشهادات بيرد عليها كاش اللوتات الناقصة والـ backend
+        """
+        self.refresh_if_changed()
+        count = 0
+        try:
+            for ext in extraction_results:
+                count += 1
+                matches = self.resolve_lots(ext.get('lot_numbers', []))
+                missing = [lot for lot, m in matches.items() if m is None]
+                if missing:
+                    logger.warning(f"Lots not found in ERP: {missing}")
+                suggestions = {lot: self.suggest_lots(lot) for lot in missing}
+                
+                result = self.build_certificate_result(ext, self.build_lot_results(ext, matches, suggestions))
+                logger.info(f"{result['file_name']}: {result['found_count']}/{result['total_lots']} found -> {result['annotation_text']}")
+                yield result
+        finally:
+            if count:
+                self.log_missing_lots()
+                self.log_routing()
+                self.log_annotation_cache()
     
     def run(self, extraction_results=None):
         logger.info("Starting ERPAgent...")
+        self.refresh_if_changed()
         if extraction_results:
             return self.process_all(extraction_results)
         return []
@@ -1,25 +1,154 @@
 # ExtractLotAgent.py - النسخة المصححة
 import os
 import re
+import json
+import hashlib
+import sqlite3
 import yaml
 from datetime import datetime
 import logging
 
+from utils.product_matcher import ProductMatcher
+from utils.inbox_scanner import InboxScanner
+from utils.pdf_text import PdfTextReader, PYMUPDF_AVAILABLE
+from utils.ocr import OcrReader, OCR_AVAILABLE, DEFAULT_REGION, find_tesseract
+from utils.image_to_pdf import ImageConverter, PILLOW_AVAILABLE, IMAGE_EXTENSIONS, is_image
+from utils.extraction_cache import ExtractionCache
+
 logger = logging.getLogger('CertPrintAgent')
 
+# غيّره مع أي تغيير في الأنماط أو extract_lot_numbers - نتايج كاش الاستخراج القديمة بتتمسح
+GRAMMAR_VERSION = 1
+
+DEFAULT_PRODUCTS = ['Basil', 'Fennel', 'Peppermint', 'Marjoram', 'Sage', 'Thyme',
+                    'Rosemary', 'Oregano', 'Parsley', 'Cilantro', 'Dill', 'Chamomile',
+                    'Hibiscus', 'Calendula', 'Lavender', 'Melissa']
+
+# أنماط اسم الملف بالترتيب - أول نمط يطابق ونتيجته تتفهم هو اللي بيكسب
+# (نمط مرن يقبل مسافات وعلامات مختلفة)
+FILENAME_PATTERNS = [
+    ('lot_number', re.compile(r'Lot\s*Number\s*[:_\s-]*\s*([A-Za-z0-9\-\/]+)', re.IGNORECASE)),  # Lot Number : 139859-139860
+    ('lot', re.compile(r'Lot\s*[:_\s-]*\s*([A-Za-z0-9\-\/]+)', re.IGNORECASE)),                   # Lot : 139859-139860
+    ('product_multi', re.compile(r'[A-Za-z]+\s+(\d{5,6}[\/\-]\d{5,6})', re.IGNORECASE)),         # Basil 139859-139860
+    ('product_single', re.compile(r'[A-Za-z]+\s+(\d{5,6})', re.IGNORECASE)),                       # Basil 139385
+]
+ANY_LOT = re.compile(r'\d{5,6}')
+IMPLICIT_MULTI = re.compile(r'^(\d{5,6})[\/\-](\d{1,2})$')
+SINGLE_LOT = re.compile(r'(\d{5,6})')
+LEADING_WORD = re.compile(r'^([A-Za-z]+)')
+QUOTES = str.maketrans('', '', '\'"`')
+# اللوت في نص الـ PDF لازم يكون جنب كلمة Lot (النص مليان أرقام تانية: تواريخ وتليفونات)
+TEXT_PATTERNS = [
+    re.compile(r'\bLot\s*(?:Number|No\.?|Nr\.?|#)\s*[:_\s-]*\s*([A-Za-z0-9\-\/]+)', re.IGNORECASE),  # Lot No.: 139859
+    re.compile(r'\bLot\s*[:_\s-]*\s*([A-Za-z0-9\-\/]+)', re.IGNORECASE),                                # Lot 139859
+]
+
 class ExtractLotAgent:
     def __init__(self, config_path="config.yaml"):
         self.config = self.load_config(config_path)
+        extraction_config = self.config.get('extraction', {})
+        products = extraction_config.get('products') or DEFAULT_PRODUCTS
+        self.product_matcher = ProductMatcher(products)
+        
+        cert_inbox = self.config.get('paths', {}).get('cert_inbox', 'InPut/Cert_Inbox')
+        
+        # صور الشهادات اللي Outlook بيحفظها بتتحول لـ PDF قبل الاستخراج
+        self.image_converter = None
+        images_config = self.config.get('images', {})
+        if images_config.get('enabled', True):
+            if PILLOW_AVAILABLE:
+                self.image_converter = ImageConverter(
+                    images_config.get('cache_dir', 'OutPut/Converted_Images'),
+                    self.config.get('paths', {}).get('source_cert', 'InPut/Source_Cert'),
+                    dpi=images_config.get('dpi', 200),
+                    quality=images_config.get('jpeg_quality', 75),
+                    workers=images_config.get('workers', 2),
+                    timeout=images_config.get('timeout_seconds', 60),
+                )
+                self.image_converter.prune_cache(images_config.get('cache_max_age_days', 30))
+            else:
+                logger.warning("Pillow not installed - image certificates will not be converted")
         
+        extensions = ('.pdf',) + (IMAGE_EXTENSIONS if self.image_converter else ())
+        self.inbox = InboxScanner(cert_inbox, extensions=extensions,
+                                  max_failures=extraction_config.get('max_failures', 3))
+        
+        # لو اسم الملف مفيهوش لوت: نص أول صفحة في الـ PDF
+        self.text_reader = None
+        text_config = extraction_config.get('pdf_text', {})
+        if text_config.get('enabled', True):
+            if PYMUPDF_AVAILABLE:
+                self.text_reader = PdfTextReader(
+                    self.extract_lot_from_text,
+                    workers=text_config.get('workers', 2),
+                    timeout=text_config.get('timeout_seconds', 30),
+                    cache_size=text_config.get('cache_size', 1024),
+                )
+            else:
+                logger.warning("PyMuPDF not installed - PDF text fallback disabled")
+        
+        # الشهادات الممسوحة (من غير نص): OCR اختياري بعد نص الـ PDF
+        self.ocr_reader = None
+        ocr_config = self.config.get('ocr', {})
+        if ocr_config.get('enabled', False) and self.text_reader:
+            base_dir = self.config.get('paths', {}).get('base_dir', '.')
+            tesseract_cmd = find_tesseract(ocr_config.get('tesseract_path'), base_dir)
+            if not OCR_AVAILABLE:
+                logger.warning("pytesseract/Pillow not installed - OCR disabled")
+            elif not tesseract_cmd:
+                logger.warning("Tesseract binary not found - OCR disabled")
+            else:
+                self.ocr_reader = OcrReader(
+                    lambda text: self.extract_lot_from_text(text, source='ocr'),
+                    tesseract_cmd,
+                    ExtractLotAgent.extract_lot_from_text,
+                    dpi=ocr_config.get('dpi', 300),
+                    region=ocr_config.get('region', DEFAULT_REGION),
+                    language=ocr_config.get('language', 'eng'),
+                    workers=ocr_config.get('workers', 0),
+                    timeout=ocr_config.get('timeout_seconds', 120),
+                    cache_size=ocr_config.get('cache_size', 1024),
+                )
+        
+        # نتايج الاستخراج بين الدورات للملفات اللي فاضلة في الـ inbox - بتتفتح أول دورة
+        self.cache = None
+        self.cache_path = None
+        if extraction_config.get('cache', True):
+            base_dir = self.config.get('paths', {}).get('base_dir', '.')
+            self.cache_path = os.path.join(base_dir, extraction_config.get('cache_db', 'extraction_cache.db'))
+            self.cache_max_age = extraction_config.get('cache_max_age_days', 30)
+            self.grammar = self.grammar_key(products)
+        
+    def grammar_key(self, products):
+        """أي حاجة بتغير نتيجة الاستخراج: الأنماط، المنتجات، والمراحل الشغالة"""
+        ocr = self.ocr_reader.settings if self.ocr_reader else None
+        grammar = {
+            'version': GRAMMAR_VERSION,
+            'products': list(products),
+            'pdf_text': self.text_reader is not None,
+            'ocr': [ocr['dpi'], list(ocr['region']), ocr['language']] if ocr else None,
+        }
+        return hashlib.sha1(json.dumps(grammar).encode('utf-8')).hexdigest()[:16]
+    
+    def get_cache(self):
+        if self.cache is None and self.cache_path:
+            try:
+                self.cache = ExtractionCache(self.cache_path, self.grammar, self.cache_max_age)
+            except sqlite3.Error as e:
+                logger.error(f"Extraction cache disabled: {e}")
+                self.cache_path = None
+        return self.cache
+    
     def load_config(self, config_path):
         try:
             with open(config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
+                return yaml.safe_load(f) or {}
         except:
             return {}
     
     # ExtractLotAgent.py - تصحيح استخراج الأرقام
-    def extract_lot_numbers(self, lot_string):
+    @staticmethod
+    def extract_lot_numbers(lot_string):
         """
         استخراج كل أرقام اللوت من النص
         """
@@ -27,10 +156,10 @@ class ExtractLotAgent:
         logger.info(f"Parsing lot string: '{lot_string}'")
         
         # تنظيف النص
-        lot_string = lot_string.replace("'", "").replace('"', '').replace('`', '')
+        lot_string = lot_string.translate(QUOTES)
         
         # النمط 1: رقم-عدد (مثال: 139921-3 أو 139921/3) → implicit multi
-        match = re.match(r'^(\d{5,6})[\/\-](\d{1,2})$', lot_string)
+        match = IMPLICIT_MULTI.match(lot_string)
         if match:
             base_lot = match.group(1)
             count = int(match.group(2))
@@ -70,7 +199,7 @@ class ExtractLotAgent:
                 }
         
         # النمط 4: رقم واحد
-        number_match = re.search(r'(\d{5,6})', lot_string)
+        number_match = SINGLE_LOT.search(lot_string)
         if number_match:
             lot_num = number_match.group(1)
             logger.info(f"Found single lot: {lot_num}")
@@ -91,35 +220,22 @@ class ExtractLotAgent:
         # إزالة الامتداد
         name_without_ext = os.path.splitext(filename)[0]
         
-        # البحث عن نمط "Lot Number : XXX" في اسم الملف
-        # نمط مرن يقبل مسافات وعلامات مختلفة
-        patterns = [
-            r'Lot\s*Number\s*[:_\s-]*\s*([A-Za-z0-9\-\/]+)',  # Lot Number : 139859-139860
-            r'Lot\s*[:_\s-]*\s*([A-Za-z0-9\-\/]+)',           # Lot : 139859-139860
-            r'([A-Za-z]+)\s+(\d{5,6}[\/\-]\d{5,6})',          # Basil 139859-139860
-            r'([A-Za-z]+)\s+(\d{5,6})',                       # Basil 139385
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, name_without_ext, re.IGNORECASE)
-            if match:
-                # لو النمط فيه مجموعتين (منتج + رقم)، خد الرقم
-                if len(match.groups()) >= 2 and match.group(2):
-                    lot_string = match.group(2).strip()
-                else:
-                    lot_string = match.group(1).strip()
-                
-                logger.info(f"Matched pattern '{pattern}': {lot_string}")
-                
-                parsed = self.extract_lot_numbers(lot_string)
-                if parsed:
-                    return {
-                        "lot_raw": lot_string,
-                        "lot_parsed": parsed
-                    }
+        for pattern_name, pattern in FILENAME_PATTERNS:
+            match = pattern.search(name_without_ext)
+            if not match:
+                continue
+            lot_string = match.group(1).strip()
+            logger.info(f"Matched pattern '{pattern_name}': {lot_string}")
+            
+            parsed = self.extract_lot_numbers(lot_string)
+            if parsed:
+                return {
+                    "lot_raw": lot_string,
+                    "lot_parsed": parsed
+                }
         
         # محاولة أخيرة: دور على أي رقم 5-6 أرقام في الاسم
-        numbers = re.findall(r'\d{5,6}', name_without_ext)
+        numbers = ANY_LOT.findall(name_without_ext)
         if numbers:
             logger.info(f"Found numbers in filename: {numbers}")
             if len(numbers) >= 2:
@@ -148,29 +264,46 @@ class ExtractLotAgent:
         logger.error(f"✗✗✗ NO LOT NUMBER FOUND IN FILENAME: {filename} ✗✗✗")
         return None
     
+    @staticmethod
+    def extract_lot_from_text(text, source='pdf_text'):
+        """
+        اللوت من نص الـ PDF أو الـ OCR بنفس قواعد extract_lot_numbers - أول Lot
+        يتفهم هو اللي بيكسب. static عشان workers الـ OCR بيستخدموها
+        """
+        for pattern in TEXT_PATTERNS:
+            for match in pattern.finditer(text):
+                lot_string = match.group(1).strip()
+                if not any(ch.isdigit() for ch in lot_string):
+                    continue  # "Lot Number" نفسها أو كلمة بعد Lot
+                parsed = ExtractLotAgent.extract_lot_numbers(lot_string)
+                if parsed:
+                    return {
+                        "lot_raw": lot_string,
+                        "lot_parsed": parsed,
+                        "source": source
+                    }
+        return None
+    
     def extract_product_name(self, filename):
         """استخراج اسم المنتج من اسم الملف"""
         name_without_ext = os.path.splitext(filename)[0]
         
-        products = ['Basil', 'Fennel', 'Peppermint', 'Marjoram', 'Sage', 'Thyme', 
-                   'Rosemary', 'Oregano', 'Parsley', 'Cilantro', 'Dill', 'Chamomile',
-                   'Hibiscus', 'Calendula', 'Lavender', 'Melissa']
+        product = self.product_matcher.match(name_without_ext)
+        if product is not None:
+            return product
         
-        for product in products:
-            if product.lower() in name_without_ext.lower():
-                return product
-        
-        match = re.search(r'^([A-Za-z]+)', name_without_ext)
+        match = LEADING_WORD.search(name_without_ext)
         if match:
             return match.group(1)
         
         return "UNKNOWN"
     
-    def process_certificate(self, cert_path):
+    def process_certificate(self, cert_path, lot_data=None):
         logger.info(f"Processing: {os.path.basename(cert_path)}")
         
         filename = os.path.basename(cert_path)
-        lot_data = self.extract_lot_from_filename(filename)
+        if lot_data is None:
+            lot_data = self.extract_lot_from_filename(filename)
         
         if not lot_data:
             logger.error("FAILED - No lot found in filename")
@@ -200,35 +333,149 @@ class ExtractLotAgent:
             "lot_structure": parsed["type"],
             "total_count": parsed["count"],
             "annotation_hint": parsed.get("annotation_hint"),
+            "lot_source": lot_data.get("source", "filename"),
             "extraction_time": datetime.now().isoformat(),
         }
         
         logger.info(f"SUCCESS: Lots={result['lot_numbers']}, Type={parsed['type']}, Product={product_name}")
         return result
     
-    def run(self):
-        logger.info("=== ExtractLotAgent (Filename-Based - Multi-Lot Support) ===")
+    def iter_certificates(self):
+        """الشهادات واحدة واحدة أول ما تتقري - الـ inbox بيتقري مرة واحدة في الأول"""
+        cache = self.get_cache()
+        if cache is not None:
+            cache.start_cycle()
+        try:
+            yield from self.extract_inbox()
+        finally:
+            if cache is not None:
+                cache.flush()
+                self.log_cache()
+    
+    def log_cache(self):
+        stats = self.cache.stats
+        if stats['hits'] or stats['failure_hits'] or stats['misses']:
+            logger.info(f"Extraction cache: {stats['hits']} hit(s), {stats['failure_hits']} remembered failure(s), "
+                        f"{stats['misses']} miss(es) ({self.cache.hit_rate():.0%} hit rate)")
+    
+    def extract_inbox(self):
+        cert_files = self.inbox.scan()
+        scan = self.inbox.last_scan
+        logger.info(f"Found {scan['files']} certificate file(s): {scan['pending']} to process, {scan['quarantined']} quarantined")
         
-        cert_inbox = self.config.get('paths', {}).get('cert_inbox', 'InPut/Cert_Inbox')
+        images = [path for path in cert_files if is_image(path)]
+        conversions = self.image_converter.submit(images) if images else None
+        
+        yield from self.extract_pdfs([path for path in cert_files if not is_image(path)])
+        
+        if conversions:
+            converted = []
+            for image_path, pdf_path, error in self.image_converter.collect(conversions):
+                if error:
+                    logger.error(f"{os.path.basename(image_path)}: {error}")
+                    self.inbox.record_failure(image_path, error)
+                    continue
+                self.inbox.track(pdf_path)
+                converted.append(pdf_path)
+            stats = self.image_converter.stats
+            logger.info(f"Images: {len(images)} file(s), {stats['converted']} converted, "
+                        f"{stats['cached']} from cache, {stats['errors']} error(s) so far")
+            yield from self.extract_pdfs(converted)
+    
+    def accept(self, cert_path, lot_data):
+        """الشهادة اتعرف لوتها - بتتسجل في الـ inbox والكاش"""
+        result = self.process_certificate(cert_path, lot_data)
+        self.inbox.record_success(cert_path)
+        self.remember(cert_path, result)
+        return result
+    
+    def reject(self, cert_path, reason):
+        """الملف اتقري كله ومفيهوش لوت (مش خطأ قراية) - بيتحفظ في الكاش كمان"""
+        self.inbox.record_failure(cert_path, reason)
+        self.remember(cert_path, None, reason)
+    
+    def remember(self, cert_path, result, error=None):
+        signature = self.inbox.signature(cert_path)
+        if self.cache is not None and signature is not None:
+            self.cache.put(os.path.basename(cert_path), signature, result, error)
+    
+    def extract_pdfs(self, cert_files):
+        """اللوت من اسم الملف، ولو مفيش: نص الـ PDF وبعده الـ OCR"""
+        cached = []
+        named = []
+        unnamed = []
+        for cert_path in cert_files:
+            signature = self.inbox.signature(cert_path)
+            if self.cache is not None and signature is not None:
+                hit, result, error = self.cache.get(os.path.basename(cert_path), signature)
+                if hit:
+                    if result is None:
+                        self.inbox.record_failure(cert_path, error)
+                    else:
+                        cached.append((cert_path, result))
+                    continue
+            
+            lot_data = self.extract_lot_from_filename(os.path.basename(cert_path))
+            if lot_data:
+                named.append((cert_path, lot_data))
+            else:
+                unnamed.append(cert_path)
+        
+        # قراية الـ PDFs اللي أسماءها مفيهاش لوت بتبدأ في الخلفية قبل أول شهادة
+        jobs = self.text_reader.submit(unnamed) if unnamed and self.text_reader else None
         
-        if not os.path.exists(cert_inbox):
-            logger.error(f"Inbox not found: {cert_inbox}")
-            return []
+        for cert_path, result in cached:
+            self.inbox.record_success(cert_path)
+            yield dict(result, file_path=cert_path, extraction_time=datetime.now().isoformat())
         
-        cert_files = [f for f in os.listdir(cert_inbox) if f.lower().endswith('.pdf')]
-        logger.info(f"Found {len(cert_files)} PDF(s)")
+        for cert_path, lot_data in named:
+            yield self.accept(cert_path, lot_data)
+        
+        if jobs is None:
+            for cert_path in unnamed:
+                self.reject(cert_path, "No lot found in filename")
+            return
+        
+        scanned = yield from self.collect_fallback(self.text_reader, jobs, retry=self.ocr_reader is not None)
+        if scanned:
+            ocr_jobs = self.ocr_reader.submit(scanned)
+            yield from self.collect_fallback(self.ocr_reader, ocr_jobs, retry=False)
+            stats = self.ocr_reader.stats
+            if stats['opened']:
+                logger.info(f"OCR: {stats['opened']} file(s), {stats['seconds'] / stats['opened']:.2f}s average, "
+                            f"{stats['max_seconds']:.2f}s max, {stats['full_page']} full page, "
+                            f"{stats['hits']} cached so far")
+    
+    def collect_fallback(self, reader, jobs, retry):
+        """
+        نتايج الـ PDF text أو الـ OCR: اللي اتلقى له لوت بيطلع على طول. بترجع
+        (مع retry) الملفات اللي اتقرت من غير لوت عشان المرحلة اللي بعدها
+        """
+        no_lot = []
+        for cert_path, lot_data, error in reader.collect(jobs):
+            if lot_data:
+                logger.info(f"Lot found by {reader.label}: {os.path.basename(cert_path)} -> {lot_data['lot_raw']}")
+                yield self.accept(cert_path, lot_data)
+            elif error:
+                logger.error(f"{os.path.basename(cert_path)}: {error}")
+                self.inbox.record_failure(cert_path, error)
+            elif retry:
+                no_lot.append(cert_path)
+            else:
+                self.reject(cert_path, f"No lot found in filename or {reader.label}")
+        stats = reader.stats
+        logger.info(f"{reader.label} fallback: {len(jobs)} file(s), {stats['opened']} opened, "
+                    f"{stats['hits']} cached, {stats['errors']} error(s) so far")
+        return no_lot
+    
+    def run(self):
+        logger.info("=== ExtractLotAgent (Filename-Based - Multi-Lot Support) ===")
         
-        results = []
-        for filename in cert_files:
-            cert_path = os.path.join(cert_inbox, filename)
-            result = self.process_certificate(cert_path)
-            if result:
-                results.append(result)
+        results = list(self.iter_certificates())
         
         logger.info(f"=== COMPLETED: {len(results)} successful ===")
         return results
 
-
 def extract_lots_from_certificates(config_path="config.yaml"):
     agent = ExtractLotAgent(config_path)
     return agent.run()
\ No newline at end of file
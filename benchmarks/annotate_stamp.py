@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+كتابة التعليق على شهادات ممسوحة كبيرة: PyPDF2 (إعادة كتابة الملف كله) ضد
+الـ incremental update بتاع PyMuPDF.
+
+    python benchmarks/annotate_stamp.py                      # 40 صفحة (~40 MB)
+    python benchmarks/annotate_stamp.py --pages 80 --repeat 3
+
+كل طريقة بتشتغل في process لوحدها عشان أعلى ذاكرة (peak RSS) تتقاس صح - على
+ويندوز الذاكرة مش بتتقاس. بيتأكد كمان إن الملفين فيهم نفس عدد الصفحات والنص.
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+import multiprocessing
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+TEXT = 'عزمي ابراهيم - Lot 2601'
+
+
+def make_scan(path, pages, side):
+    """PDF صفحاته صور رمادي noise (مبتتضغطش) - زي الشهادات الممسوحة"""
+    import fitz
+    rng = random.Random(0)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page(width=595, height=842)
+        pixmap = fitz.Pixmap(fitz.csGRAY, side, side, rng.randbytes(side * side), False)
+        page.insert_image(page.rect, pixmap=pixmap)
+    doc.save(path)
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / (1024 if sys.platform == 'darwin' else 1)
+
+
+def run_engine(engine, workdir, src, repeat, queue):
+    """في process جديد: الوقت لكل شهادة وأعلى ذاكرة"""
+    logging.getLogger('CertPrintAgent').setLevel(logging.CRITICAL)
+    from Agents.AnnotatePrintAgent import AnnotatePrintAgent
+    agent = AnnotatePrintAgent(os.path.join(workdir, 'config.yaml'))
+    agent.incremental = engine == 'incremental'
+    text = agent.prepare_arabic_text(TEXT)
+
+    baseline = peak_rss_mb()
+    best = None
+    out = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = agent.build_annotated_pdf(src, TEXT)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        time.sleep(1.0)  # اسم الملف بالثانية
+    peak = peak_rss_mb()
+
+    import fitz
+    with fitz.open(out) as doc:
+        ok = text.split()[0] in doc.load_page(0).get_text().replace('\xa0', ' ')
+        page_count = doc.page_count
+    queue.put({
+        'engine': engine,
+        'seconds': best,
+        'size_mb': os.path.getsize(out) / 1024 / 1024,
+        'peak_mb': peak - baseline if peak is not None else None,
+        'pages': page_count,
+        'stamped': ok,
+        'incremental': agent.annotate_stats['incremental'] > 0,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Annotated PDF: PyPDF2 rewrite vs incremental stamp')
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--side', type=int, default=1000, help='أبعاد صورة كل صفحة (side x side رمادي)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(workdir, 'config.yaml'), 'w', encoding='utf-8') as f:
+            yaml.safe_dump({'paths': {'base_dir': workdir}}, f)
+        src = os.path.join(workdir, 'scan.pdf')
+        make_scan(src, args.pages, args.side)
+        print(f"Source: {args.pages} page(s), {os.path.getsize(src) / 1024 / 1024:.1f} MB")
+
+        ctx = multiprocessing.get_context('spawn')
+        results = []
+        for engine in ('rewrite', 'incremental'):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=run_engine, args=(engine, workdir, src, args.repeat, queue))
+            proc.start()
+            results.append(queue.get())
+            proc.join()
+
+    for r in results:
+        peak = f"{r['peak_mb']:.0f} MB" if r['peak_mb'] is not None else 'n/a'
+        print(f"{r['engine']:<12} {r['seconds'] * 1000:8.0f} ms  out {r['size_mb']:6.1f} MB  "
+              f"peak +{peak:<8} pages {r['pages']}  stamped {r['stamped']}  incremental {r['incremental']}")
+    rewrite, incremental = results
+    print(f"Speed-up: {rewrite['seconds'] / incremental['seconds']:.1f}x")
+    if rewrite['pages'] != incremental['pages'] or not (rewrite['stamped'] and incremental['stamped']):
+        print("MISMATCH between engines")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
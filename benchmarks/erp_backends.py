@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+مقارنة الـ ERP backends: نفس اللوتات لازم ترجع نفس النتيجة بالظبط، ومعاها سرعة البحث.
+
+    python benchmarks/erp_backends.py                      # ملف إكسيل صناعي
+    python benchmarks/erp_backends.py --workbook Raw_Warehouses.xlsx --sheets 2026 2025
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import COLUMNS, make_workbook
+from utils.erp_backend import ExcelBackend
+from utils.erp_sqlite import SQLiteBackend
+
+
+def query_set(keys, count, seed=2):
+    """لوتات موجودة، نفس اللوت بأصفار زيادة أو ناقصة، ولوتات مش موجودة"""
+    rng = random.Random(seed)
+    queries = rng.sample(keys, min(count, len(keys)))
+    queries += [f"0{k}" for k in rng.sample(keys, min(count // 4, len(keys)))]
+    queries += [k.lstrip('0') for k in keys if k.startswith('0')][: count // 4]
+    queries += [str(rng.randint(10 ** 7, 10 ** 8)) for _ in range(count // 4)]
+    queries += ['', ' ', 'nan', '0']
+    rng.shuffle(queries)
+    return queries
+
+
+def throughput(fn, items, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(items)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(items) / best if best else float('inf')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ERP backend conformance + throughput')
+    parser.add_argument('--workbook', help='ملف إكسيل موجود (الافتراضي: ملف صناعي)')
+    parser.add_argument('--sheets', nargs='+', default=['2026', '2025', '2024', '2023'])
+    parser.add_argument('--rows', type=int, default=20000, help='صفوف لكل شيت في الملف الصناعي')
+    parser.add_argument('--queries', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_path = args.workbook
+        if not excel_path:
+            excel_path = os.path.join(tmp, 'synthetic.xlsx')
+            print(f"Generating {len(args.sheets)} x {args.rows} rows...")
+            make_workbook(excel_path, args.sheets, args.rows)
+
+        excel = ExcelBackend(excel_path, args.sheets, COLUMNS, use_snapshot=False)
+        sqlite = SQLiteBackend(os.path.join(tmp, 'lots.db'), args.sheets, pool_size=args.threads,
+                               excel_path=excel_path, column_names=COLUMNS)
+        backends = [excel, sqlite]
+        for backend in backends:
+            start = time.perf_counter()
+            backend.refresh()
+            print(f"{backend.name:>7} load: {time.perf_counter() - start:.2f}s")
+
+        # conformance
+        keys = excel.lot_keys()
+        failures = 0
+        if sqlite.lot_keys() != keys:
+            print("FAIL lot_keys differ")
+            failures += 1
+        queries = query_set(keys, args.queries)
+        expected = {q: excel.lookup(q) for q in queries}
+        for backend in backends:
+            single = {q: backend.lookup(q) for q in queries}
+            batch = backend.lookup_many(queries)
+            for q in queries:
+                for mode, got in (('lookup', single[q]), ('lookup_many', batch[q])):
+                    if (tuple(got) if got else None) != expected[q]:
+                        failures += 1
+                        if failures <= 10:
+                            print(f"FAIL {backend.name}.{mode}({q!r}): {got} != {expected[q]}")
+        found = sum(1 for v in expected.values() if v is not None)
+        print(f"conformance: {len(queries)} queries ({found} found), {failures} mismatch(es)")
+
+        # throughput
+        for backend in backends:
+            single = throughput(lambda items: [backend.lookup(q) for q in items], queries)
+            batch = throughput(backend.lookup_many, queries)
+            chunks = [queries[i::args.threads] for i in range(args.threads)]
+            with ThreadPoolExecutor(max_workers=args.threads) as pool:
+                threaded = throughput(lambda items: list(pool.map(backend.lookup_many, chunks)), queries)
+            print(f"{backend.name:>7}: {single:,.0f} lookups/s single, {batch:,.0f}/s batch, "
+                  f"{threaded:,.0f}/s with {args.threads} threads")
+
+        for backend in backends:
+            backend.close()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
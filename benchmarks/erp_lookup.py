@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Benchmark لـ ERPAgent على ملفات Raw_Warehouses.xlsx صناعية.
+
+    python benchmarks/erp_lookup.py --rows 100000 --output results.json
+    python benchmarks/erp_lookup.py --rows 100000 --output baseline.json          # قبل التعديل
+    python benchmarks/erp_lookup.py --rows 100000 --baseline baseline.json        # بعد التعديل
+
+بيقيس: التحميل البارد (من الإكسيل ومن الـ snapshot)، search_lot بعد التحميل،
+search_multiple_lots، و generate_annotation_text. كل قياس هو الـ median بتاع
+--repeat مرة ومعاه الـ spread (الـ IQR كنسبة من الـ median). مع --baseline القياس
+بيتعلم regression (والسكريبت بيخرج بـ 1) لو بقى أبطأ بأكتر من --threshold وكمان
+أكتر من الـ spread بتاع التشغيلتين - الفرق اللي جوه الـ noise مش بيتحسب،
+والقياسات اللي اتعلمت بتتقاس تاني (--confirm) ولازم تطلع أبطأ في المرتين.
+"""
+import os
+import gc
+import sys
+import json
+import time
+import random
+import statistics
+import logging
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import COLUMNS, sheet_names, make_workbook, make_queries
+from Agents.ERPAgent import ERPAgent
+
+
+def timed(fn, repeat, setup=None, min_sample_seconds=0.2):
+    """
+    الـ median والـ spread (IQR / median) من repeat مرة بعد مرة تسخين مش
+    بتتحسب - setup قبل كل مرة وبرا القياس. من غير setup الـ fn بتتكرر جوه
+    المرة الواحدة لحد min_sample_seconds (زي timeit) عشان القياسات القصيرة
+    متبقاش noise، والوقت بيتقسم على عدد التكرار
+    """
+    loops = 1
+    samples = []
+    for i in range(repeat + 1):
+        if setup:
+            setup()
+        gc.collect()
+        gc.disable()  # زي timeit: الـ GC بيشتغل في أوقات عشوائية
+        try:
+            start = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        if i:
+            samples.append(elapsed / loops)
+        elif not setup and elapsed < min_sample_seconds:
+            loops = max(1, int(min_sample_seconds / max(elapsed, 1e-6)))
+    median = statistics.median(samples)
+    spread = 0.0
+    if len(samples) >= 2 and median:
+        q1, _, q3 = statistics.quantiles(samples, n=4)
+        spread = (q3 - q1) / median
+    return {'seconds': median, 'spread': spread, 'samples': len(samples)}
+
+
+def per_op(result, ops):
+    seconds = result['seconds']
+    return dict(result, ops=ops, us_per_op=seconds / ops * 1e6, ops_per_s=ops / seconds)
+
+
+def workbook_path(workdir, args):
+    """الملف الصناعي بيتعمل مرة واحدة لكل مجموعة parameters"""
+    name = f"erp_{args.sheets}x{args.rows}_z{args.leading_zero_ratio}_s{args.seed}.xlsx"
+    path = os.path.join(workdir, name)
+    if not os.path.exists(path):
+        print(f"Generating {name}...")
+        start = time.perf_counter()
+        make_workbook(path, sheet_names(args.sheets), args.rows, args.leading_zero_ratio, args.seed)
+        print(f"  done in {time.perf_counter() - start:.1f}s")
+    return path
+
+
+def write_config(workdir, excel_path, args, snapshot):
+    config = {
+        'paths': {'base_dir': workdir, 'erp_file': os.path.basename(excel_path)},
+        'excel': {'sheets': sheet_names(args.sheets), 'columns': COLUMNS, 'snapshot': snapshot},
+        'erp': {'backend': args.backend, 'sqlite_path': os.path.splitext(excel_path)[0] + '.db'},
+    }
+    path = os.path.join(workdir, f"bench_{'snapshot' if snapshot else 'cold'}.yaml")
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    return path
+
+
+def remove_caches(excel_path):
+    base = os.path.splitext(excel_path)[0]
+    for suffix in ('.snapshot.db', '.db', '.db-wal', '.db-shm'):
+        if os.path.exists(base + suffix):
+            os.remove(base + suffix)
+
+
+def run_benchmarks(args, workdir):
+    excel_path = workbook_path(workdir, args)
+    results = {}
+
+    # 1. تحميل بارد من الإكسيل
+    cold_config = write_config(workdir, excel_path, args, snapshot=args.backend == 'excel')
+    agents = []
+
+    def cold_start():
+        if agents:
+            agents.pop().backend.close()
+        remove_caches(excel_path)
+        agents.append(ERPAgent(cold_config))
+
+    results['cold_load'] = timed(lambda: agents[-1].refresh_if_changed(), args.load_repeat, cold_start)
+    agents.pop().backend.close()
+
+    # 2. إعادة تشغيل: الـ snapshot أو قاعدة SQLite موجودين
+    restart_config = write_config(workdir, excel_path, args, snapshot=True)
+
+    def restart():
+        if agents:
+            agents.pop().backend.close()
+        agents.append(ERPAgent(restart_config))
+
+    results['restart_load'] = timed(lambda: agents[-1].refresh_if_changed(), args.load_repeat, restart)
+    agent = agents.pop()
+
+    keys = agent.backend.lot_keys()
+    queries = make_queries(keys, args.queries, args.miss_ratio, args.seed)
+
+    # 3. search_lot بعد التحميل (ومعاه الاقتراحات للوتات الناقصة)
+    agent.suggest_lots('0')  # فهرس الاقتراحات بيتبني هنا مش جوه القياس
+    timing = timed(lambda: [agent.search_lot(q) for q in queries], args.repeat)
+    results['search_lot'] = per_op(timing, len(queries))
+
+    # 4. search_multiple_lots - شهادات فيها من لوت لـ 3
+    rng = random.Random(args.seed)
+    extractions = []
+    i = 0
+    while i < len(queries):
+        n = rng.choice([1, 1, 1, 2, 3])
+        lots = queries[i:i + n]
+        i += n
+        extractions.append({
+            'lot_numbers': lots,
+            'lot_info': [{'type': 'single' if len(lots) == 1 else 'explicit_multi'} for _ in lots],
+        })
+    timing = timed(lambda: [agent.search_multiple_lots(e) for e in extractions], args.repeat)
+    results['search_multiple_lots'] = per_op(timing, len(extractions))
+
+    # 5. generate_annotation_text على نتايج جاهزة
+    lot_results = [agent.search_multiple_lots(e) for e in extractions]
+    hints = [None, None, '+1']
+    timing = timed(
+        lambda: [agent.generate_annotation_text(r, hints[j % 3]) for j, r in enumerate(lot_results)],
+        args.repeat
+    )
+    results['generate_annotation_text'] = per_op(timing, len(lot_results))
+
+    agent.backend.close()
+    if not args.keep:
+        remove_caches(excel_path)
+    return results
+
+
+def metric_time(result):
+    """الرقم اللي بنقارن بيه: وقت العملية الواحدة، أو الوقت الكلي للتحميل"""
+    return result.get('us_per_op', result['seconds'])
+
+
+def compare(results, baseline, threshold):
+    """
+    بترجع أسماء القياسات اللي بقت أبطأ من الـ baseline بأكتر من threshold
+    وبأكتر من الـ noise (spread الـ baseline + spread التشغيل ده)
+    """
+    regressions = []
+    print(f"\n{'benchmark':<26}{'baseline':>14}{'current':>14}{'change':>10}{'noise':>10}")
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            print(f"{name:<26}{'-':>14}{metric_time(result):>14.3f}{'new':>10}")
+            continue
+        before, after = metric_time(base), metric_time(result)
+        change = (after - before) / before if before else 0.0
+        noise = base.get('spread', 0.0) + result.get('spread', 0.0)
+        flag = ''
+        if change > max(threshold, noise):
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<26}{before:>14.3f}{after:>14.3f}{change:>+10.1%}{noise:>10.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ERPAgent lookup benchmarks')
+    parser.add_argument('--sheets', type=int, default=4, help='عدد الشيتات (2026 ونازل)')
+    parser.add_argument('--rows', type=int, default=10000, help='صفوف لكل شيت (10k لحد 1M)')
+    parser.add_argument('--leading-zero-ratio', type=float, default=0.05)
+    parser.add_argument('--miss-ratio', type=float, default=0.1)
+    parser.add_argument('--queries', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=11, help='مرات كل قياس (الـ median)')
+    parser.add_argument('--load-repeat', type=int, default=5, help='مرات التحميل البارد وإعادة التشغيل')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--backend', choices=['excel', 'sqlite'], default='excel')
+    parser.add_argument('--workdir', help='فولدر الملفات الصناعية (بتتعمل مرة وتتستخدم تاني)')
+    parser.add_argument('--keep', action='store_true', help='سيب الـ snapshot/القاعدة بعد القياس')
+    parser.add_argument('--output', help='ملف JSON للنتايج')
+    parser.add_argument('--baseline', help='ملف JSON من تشغيل قبل كده للمقارنة')
+    parser.add_argument('--threshold', type=float, default=0.10, help='نسبة البطء اللي تعتبر regression')
+    parser.add_argument('--confirm', type=int, default=1,
+                        help='مرات إعادة القياس للي اتعلم regression (لازم يفضل أبطأ كل مرة)')
+    args = parser.parse_args()
+
+    # الـ logging بتاع الـ agent مش جزء من القياس
+    logging.getLogger('CertPrintAgent').setLevel(logging.ERROR)
+
+    workdir = args.workdir or os.path.join(tempfile.gettempdir(), 'cert_print_bench')
+    os.makedirs(workdir, exist_ok=True)
+    results = run_benchmarks(args, workdir)
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'params': {
+            k: v for k, v in vars(args).items()
+            if k not in ('output', 'baseline', 'workdir', 'keep', 'threshold', 'confirm')
+        },
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'results': results,
+    }
+
+    for name, result in results.items():
+        if 'us_per_op' in result:
+            print(f"{name:<26}{result['us_per_op']:>12.1f} us/op {result['ops_per_s']:>12,.0f} ops/s"
+                  f"  ±{result['spread']:.1%}")
+        else:
+            print(f"{name:<26}{result['seconds']:>12.3f} s  ±{result['spread']:.1%}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('params') != report['params']:
+            print("Warning: baseline was recorded with different parameters")
+        regressions = compare(results, baseline, args.threshold)
+        for _ in range(args.confirm):
+            if not regressions:
+                break
+            # الجهاز ممكن يكون كان مشغول وقتها - القياس تاني والـ regression لازم يتكرر
+            print(f"\nRe-running to confirm: {', '.join(regressions)}")
+            rerun = run_benchmarks(args, workdir)
+            confirmed = compare({name: rerun[name] for name in regressions}, baseline, args.threshold)
+            regressions = [name for name in regressions if name in confirmed]
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+استخراج اللوت والمنتج من اسم الملف: مطابقة مع الـ golden corpus + السرعة.
+
+    python benchmarks/extract_lot.py                 # مطابقة + files/s
+    python benchmarks/extract_lot.py --products 500  # ليستة منتجات كبيرة (Aho-Corasick)
+    python benchmarks/extract_lot.py --update        # بعد تغيير مقصود في السلوك بس
+
+golden/filename_lots.json اتعمل من التنفيذ القديم (4 re.search + findall + لفة
+على المنتجات) وفيه أسماء حقيقية وأسماء عشوائية فيها الحالات الصعبة.
+"""
+import os
+import sys
+import json
+import time
+import random
+import string
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Agents.ExtractLotAgent import ExtractLotAgent
+from utils.product_matcher import ProductMatcher
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden', 'filename_lots.json')
+
+
+def load_golden():
+    with open(GOLDEN, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_golden(cases):
+    with open(GOLDEN, 'w', encoding='utf-8') as f:
+        f.write('[\n' + ',\n'.join(json.dumps(c, ensure_ascii=False) for c in cases) + '\n]\n')
+
+
+def check(agent, cases):
+    failures = 0
+    for case in cases:
+        lot = agent.extract_lot_from_filename(case['filename'])
+        product = agent.extract_product_name(case['filename'])
+        if lot != case['lot'] or product != case['product']:
+            failures += 1
+            if failures <= 10:
+                print(f"FAIL {case['filename']!r}: {lot}, {product!r} != {case['lot']}, {case['product']!r}")
+    return failures
+
+
+def throughput(agent, names, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for name in names:
+            agent.extract_lot_from_filename(name)
+            agent.extract_product_name(name)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(names) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Filename lot extraction: golden corpus + throughput')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--copies', type=int, default=20, help='كام مرة الـ corpus يتكرر في قياس السرعة')
+    parser.add_argument('--products', type=int, default=0, help='ليستة منتجات صناعية بالحجم ده (0 = الافتراضية)')
+    parser.add_argument('--update', action='store_true', help='اكتب النتايج الحالية في الـ golden corpus')
+    args = parser.parse_args()
+
+    logging.getLogger('CertPrintAgent').setLevel(logging.CRITICAL)
+    agent = ExtractLotAgent(config_path=os.devnull)
+    cases = load_golden()
+
+    if args.update:
+        for case in cases:
+            case['lot'] = agent.extract_lot_from_filename(case['filename'])
+            case['product'] = agent.extract_product_name(case['filename'])
+        save_golden(cases)
+        print(f"Golden corpus updated: {len(cases)} filename(s)")
+        return
+
+    failures = check(agent, cases)
+    print(f"golden corpus: {len(cases)} filename(s), {failures} mismatch(es)")
+
+    if args.products:
+        rng = random.Random(1)
+        products = [''.join(rng.choice(string.ascii_letters) for _ in range(rng.randint(4, 10)))
+                    for _ in range(args.products)]
+        agent.product_matcher = ProductMatcher(products + agent.product_matcher.products)
+    mode = 'automaton' if agent.product_matcher.use_automaton else 'scan'
+    names = [case['filename'] for case in cases] * args.copies
+    rate = throughput(agent, names, args.repeat)
+    print(f"extraction: {rate:,.0f} files/s ({1e6 / rate:.1f} us/file, "
+          f"{len(agent.product_matcher.products)} products, {mode})")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
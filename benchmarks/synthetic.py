@@ -0,0 +1,65 @@
+# synthetic.py - ملفات Raw_Warehouses.xlsx صناعية ولوتات بحث للـ benchmarks
+import random
+
+from openpyxl import Workbook
+
+COLUMNS = {'cert_lot': 'NO', 'internal_lot': 'Lot Num.', 'supplier': 'Supplier'}
+SUPPLIERS = ['Lot Foo', 'ماهر سعد', 'نصرى وسمين', 'باسم حنا', 'ACME Chemicals', 'Gulf Trading']
+
+
+def sheet_names(count, first_year=2026):
+    """أسماء الشيتات زي الملف الحقيقي: 2026، 2025، ..."""
+    return [str(first_year - i) for i in range(count)]
+
+
+def make_workbook(path, sheets, rows, leading_zero_ratio=0.05, seed=1):
+    """
+    إكسيل صناعي بنفس شكل ملف الـ ERP: كل سنة ليها نطاق أرقام أعلى من اللي قبلها
+    مع تداخل بسيط، وفيه الحالات الصعبة: أصفار في البداية، تكرار، خلايا فاضية،
+    لوتات بشرطة، ولوت داخلي رقم أو نص.
+    """
+    rng = random.Random(seed)
+    wb = Workbook(write_only=True)
+    span = rows * 3
+    for rank, sheet in enumerate(sheets):
+        ws = wb.create_sheet(sheet)
+        ws.append(['Date', 'NO', 'Supplier', 'Lot Num.', 'Qty'])
+        # الشيت الأول أحدث سنة وأعلى أرقام
+        base = 100000 + (len(sheets) - 1 - rank) * int(span * 0.9)
+        for _ in range(rows):
+            lot = base + rng.randrange(span)
+            roll = rng.random()
+            if roll < leading_zero_ratio:
+                lot = f"00{lot}"
+            elif roll < leading_zero_ratio + 0.03:
+                lot = None
+            elif roll < leading_zero_ratio + 0.05:
+                lot = f"{lot}-{rng.randint(1, 3)}"
+            supplier = rng.choice(SUPPLIERS) if rng.random() > 0.02 else None
+            internal = rng.choice([rng.randint(2600, 2700), f"Lot {rng.randint(2600, 2700)}", None])
+            ws.append([None, lot, supplier, internal, rng.randint(1, 50)])
+    wb.save(path)
+
+
+def make_queries(keys, count, miss_ratio=0.1, seed=2):
+    """
+    لوتات بحث: miss_ratio منها مش موجود، والباقي موجود وجزء منه بأصفار زيادة
+    زي ما بييجي من اسم الملف
+    """
+    rng = random.Random(seed)
+    existing = {k.lstrip('0') for k in keys}
+    numeric = [int(k) for k in keys if k.isdecimal()] or [100000]
+    low, high = min(numeric), max(numeric) * 2
+
+    queries = []
+    for _ in range(count):
+        if rng.random() < miss_ratio:
+            lot = str(rng.randint(low, high))
+            while lot in existing:
+                lot = str(rng.randint(low, high))
+        else:
+            lot = rng.choice(keys)
+            if rng.random() < 0.1:
+                lot = f"0{lot}"
+        queries.append(lot)
+    return queries
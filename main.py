@@ -9,6 +9,7 @@ import sys
 import time
 import yaml
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
@@ -37,6 +38,14 @@ class CertPrintOrchestrator:
         
         # Get check interval
         self.check_interval = self.config.get('monitoring', {}).get('check_interval_minutes', 5)
+        self.streaming = self.config.get('monitoring', {}).get('streaming', False)
+        
+        # تحميل الإكسيل والخط والطابعة في الخلفية وقت ما Outlook شغال
+        self.warmup_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='warmup')
+        self.erp_warmup = self.warmup_pool.submit(self.erp_agent.warm_up)
+        self.print_warmup = self.warmup_pool.submit(self.print_agent.warm_up)
+        # الطباعة في thread لوحده من طابور في SQLite - اللي متطبعش المرة اللي فاتت بيبدأ على طول
+        self.print_agent.start_spooler()
         
     def load_config(self, config_path):
         try:
@@ -46,6 +55,25 @@ class CertPrintOrchestrator:
             print(f"Config error: {e}")
             return {}
     
+    def wait_for_warmup(self, future, name):
+        """استنى التحميل اللي في الخلفية لو لسه مخلصش - أول دورة بس"""
+        if future is None:
+            return None
+        
+        start = time.perf_counter()
+        if not future.done():
+            self.logger.info(f"Waiting for {name} warm-up...")
+        try:
+            duration = future.result()
+        except Exception as e:
+            self.logger.error(f"{name} warm-up failed: {e}")
+            return None
+        
+        waited = time.perf_counter() - start
+        self.logger.info(f"{name} warm-up: {duration:.2f}s in background, waited {waited:.2f}s, "
+                         f"saved {max(0, duration - waited):.2f}s")
+        return None
+    
     def process_certificates(self):
         """معالجة الشهادات من البداية للنهاية"""
         try:
@@ -53,6 +81,9 @@ class CertPrintOrchestrator:
             self.logger.info("Start new process cycle...")
             self.logger.info("="*60)
             
+            if self.streaming:
+                return self.process_streaming()
+            
             # Stage 1: Extract Lot from filename (بدل OCR)
             self.logger.info("\n--- Phase 1 : Extract lot number ---")
             extraction_results = self.extract_agent.run()
@@ -65,6 +96,7 @@ class CertPrintOrchestrator:
             
             # Stage 2: ERP Lookup
             self.logger.info("\n--- Phase 2 : search in ERP ---")
+            self.erp_warmup = self.wait_for_warmup(self.erp_warmup, "ERP")
             erp_results = self.erp_agent.run(extraction_results)
             
             if not erp_results:
@@ -73,13 +105,11 @@ class CertPrintOrchestrator:
             
             # Stage 3: Annotate & Print
             self.logger.info("\n--- Phase 3 : Writing on Certification ---")
+            self.print_warmup = self.wait_for_warmup(self.print_warmup, "Printer/font")
             print_results = self.print_agent.run(erp_results)
             
             if print_results:
-                printed_count = print_results.get('printed', 0)
-                not_found_count = print_results.get('not_found', 0)
-                annotated_count = print_results.get('annotated_only', 0)
-                self.logger.info(f"✓ Printed: {printed_count}, Not Found: {not_found_count}, تعليق فقط: {annotated_count}")
+                self.log_print_results(print_results)
             
             # Cleanup: Move processed PDFs to Source_Cert
             self.archive_processed_pdfs()
@@ -92,21 +122,49 @@ class CertPrintOrchestrator:
             self.logger.error(traceback.format_exc())
             return False
     
+    def process_streaming(self):
+        """
+        الاستخراج والـ ERP والطباعة generators ورا بعض: كل شهادة بتتطبع أول ما
+        تخلص من غير ما تستنى باقي الدفعة، والذاكرة مش بتكبر مع عدد الشهادات
+        """
+        self.logger.info("\n--- Extract -> ERP -> Print (streaming) ---")
+        self.erp_warmup = self.wait_for_warmup(self.erp_warmup, "ERP")
+        self.print_warmup = self.wait_for_warmup(self.print_warmup, "Printer/font")
+        
+        extraction_results = self.extract_agent.iter_certificates()
+        erp_results = self.erp_agent.iter_results(extraction_results)
+        print_results = self.print_agent.process_stream(erp_results)
+        
+        if not print_results['total']:
+            self.logger.info("No PDFs for process")
+            return True
+        
+        self.log_print_results(print_results)
+        self.archive_processed_pdfs()
+        return True
+    
+    def log_print_results(self, print_results):
+        printed_count = print_results.get('printed', 0)
+        not_found_count = print_results.get('not_found', 0)
+        annotated_count = print_results.get('annotated_only', 0)
+        queued_count = print_results.get('queued', 0)
+        self.logger.info(f"✓ Printed: {printed_count}, Queued: {queued_count}, Not Found: {not_found_count}, تعليق فقط: {annotated_count}")
+    
     def archive_processed_pdfs(self):
         """نقل ملفات PDF المعالجة للأرشيف"""
         try:
-            cert_inbox = self.config.get('paths', {}).get('cert_inbox', 'InPut/Cert_Inbox')
             source_cert = self.config.get('paths', {}).get('source_cert', 'InPut/Source_Cert')
             
-            if not os.path.exists(cert_inbox):
-                return
+            # ملفات الـ scan بتاع الدورة دي بس: اللي وصل وإحنا شغالين يستنى الدورة الجاية،
+            # واللي الاستخراج فشل فيه يفضل في الـ inbox
+            pdf_paths = self.extract_agent.inbox.processed_files()
             
             os.makedirs(source_cert, exist_ok=True)
             
-            pdf_files = [f for f in os.listdir(cert_inbox) if f.lower().endswith('.pdf')]
-            
-            for pdf_file in pdf_files:
-                src = os.path.join(cert_inbox, pdf_file)
+            for src in pdf_paths:
+                if not os.path.exists(src):
+                    continue  # اتنقل بعد الطباعة
+                pdf_file = os.path.basename(src)
                 dst = os.path.join(source_cert, pdf_file)
                 
                 # لو الملف موجود، ضيف timestamp
@@ -177,6 +235,7 @@ class CertPrintOrchestrator:
                 self.logger.error(f"Error in cycle: {e}")
                 time.sleep(60)  # انتظر دقيقة لو حصل خطأ
         
+        self.print_agent.stop_spooler()
         self.logger.info("\n" + "="*60)
         self.logger.info("System stoped")
         self.logger.info("="*60)
@@ -189,6 +248,7 @@ class CertPrintOrchestrator:
         
         self.check_outlook()
         self.process_certificates()
+        self.print_agent.stop_spooler(drain_seconds=self.config.get('printing', {}).get('queue_drain_seconds', 300))
 
 
 def main():
@@ -198,8 +258,14 @@ def main():
     parser.add_argument('--config', default='config.yaml', help='ملف الإعدادات')
     parser.add_argument('--once', action='store_true', help='تشغيل دورة واحدة فقط')
     parser.add_argument('--no-outlook', action='store_true', help='تجاهل الإيميل، معالجة الملفات الموجودة فقط')
+    parser.add_argument('--import-erp', action='store_true', help='import ملف الإكسيل في قاعدة SQLite والخروج')
     args = parser.parse_args()
     
+    if args.import_erp:
+        get_logger(args.config)
+        ERPAgent(args.config).import_database()
+        return
+    
     orchestrator = CertPrintOrchestrator(args.config)
     
     if args.once:
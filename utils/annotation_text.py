@@ -0,0 +1,101 @@
+# annotation_text.py - توليد نص التعليق اللي بيتكتب على الشهادة (مع كاش)
+import re
+from functools import lru_cache
+
+NOT_REGISTERED = "غير مسجل في النظام"
+
+LOT_PREFIX = re.compile(r'^Lot\s+', re.IGNORECASE)
+DOUBLE_LOT = re.compile(r'\bLot\s+Lot\b', re.IGNORECASE)
+SPACES = re.compile(r'\s+')
+
+
+def clean_internal_lot(lot_num):
+    """تنظيف رقم اللوت الداخلي: إزالة .0 في النهاية و Lot في البداية"""
+    if lot_num and isinstance(lot_num, str):
+        if lot_num.endswith('.0'):
+            lot_num = lot_num[:-2]
+        lot_num = LOT_PREFIX.sub('', lot_num)
+        return lot_num.strip()
+    return lot_num
+
+
+def annotation_key(lot_results, annotation_hint=None):
+    """
+    المفتاح المختصر لنتايج اللوتات: اللي اتلقى بالمورد واللوت الداخلي بس،
+    واللي متلقاش برقمه - نفس المفتاح يعني نفس النص بالظبط
+    """
+    entries = tuple(
+        (True, r.get('supplier', ''), r.get('internal_lot', '')) if r.get('found')
+        else (False, r['cert_lot'])
+        for r in lot_results
+    )
+    return entries, annotation_hint
+
+
+def build_annotation_text(entries, annotation_hint=None):
+    """النص من المفتاح المختصر"""
+    if not entries:
+        return NOT_REGISTERED
+
+    # لو مفيش ولا واحد موجود
+    if not any(entry[0] for entry in entries):
+        lots_str = " - ".join(entry[1] for entry in entries)
+        return f"{NOT_REGISTERED} / {lots_str} N/A"
+
+    # تجميع النتائج حسب المورد
+    supplier_groups = {}
+    not_found_lots = []
+    for entry in entries:
+        if entry[0]:
+            supplier = entry[1].strip()
+            supplier_groups.setdefault(supplier, []).append(clean_internal_lot(entry[2]))
+        else:
+            not_found_lots.append(entry[1])
+
+    parts = []
+    if len(supplier_groups) == 1:
+        # مورد واحد: لوت واحد (ومعاه الـ hint لو فيه) أو كذا لوت
+        supplier, lots = next(iter(supplier_groups.items()))
+        supplier_clean = LOT_PREFIX.sub('', supplier)
+        if len(lots) == 1:
+            lot_text = lots[0]
+            if annotation_hint:
+                lot_text = f"{lot_text} {annotation_hint}"
+            parts.append(f"{supplier_clean} - {lot_text}")
+        else:
+            parts.append(f"{supplier_clean} - {' - '.join(lots)}")
+    else:
+        # موردين مختلفين
+        for supplier, lots in supplier_groups.items():
+            parts.append(f"{LOT_PREFIX.sub('', supplier)} - {' - '.join(lots)}")
+
+    if not_found_lots:
+        parts.append(f"{' - '.join(not_found_lots)} N/A")
+
+    result_text = " | ".join(parts) if len(parts) > 1 else parts[0]
+
+    # تنظيف النهائي: إزالة تكرار Lot والمسافات الزيادة
+    result_text = DOUBLE_LOT.sub('Lot', result_text)
+    return SPACES.sub(' ', result_text)
+
+
+class AnnotationTextEngine:
+    """
+    بيبني نص التعليق مرة واحدة لكل مجموعة (لوتات، hint): الشهادات اللي بتتبعت
+    تاني بنفس اللوتات بتاخد النص من LRU محدود.
+    """
+
+    def __init__(self, cache_size=1024):
+        self.cached_build = lru_cache(maxsize=cache_size)(build_annotation_text)
+
+    def text(self, lot_results, annotation_hint=None):
+        entries, hint = annotation_key(lot_results, annotation_hint)
+        try:
+            return self.cached_build(entries, hint)
+        except TypeError:
+            # قيمة مش hashable في النتايج - من غير كاش
+            return build_annotation_text(entries, hint)
+
+    def stats(self):
+        info = self.cached_build.cache_info()
+        return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
@@ -0,0 +1,256 @@
+# erp_backend.py - مصدر بيانات اللوت اللي ERPAgent بيدور فيه (إكسيل أو قاعدة بيانات)
+import os
+import time
+import zipfile
+import threading
+import xml.etree.ElementTree as ET
+import logging
+
+from utils.file_utils import FileUtils
+from utils.lot_index import LotIndex
+from utils.erp_snapshot import ERPSnapshot
+from utils.sheet_ranges import SheetRanges
+from utils.xlsx_fingerprint import WorkbookFingerprint
+from utils.xlsx_loader import WorkbookColumnLoader
+
+logger = logging.getLogger('CertPrintAgent')
+
+
+class ERPBackend:
+    """
+    الواجهة اللي ERPAgent بيستخدمها للبحث - أي backend لازم يطبقها.
+
+    lookup بيرجع (sheet, supplier, internal_lot) أو None بنفس قواعد البحث القديم:
+    أول شيت بترتيب excel.sheets، وجوه الشيت المطابقة التامة قبل المطابقة من غير
+    أصفار، وأول صف هو اللي بيكسب. version بيتغير كل ما البيانات تتغير.
+    """
+
+    name = 'base'
+
+    def __init__(self, range_gap=1000):
+        self.version = 0
+        # نطاقات أرقام اللوت لكل شيت لنفس النسخة (None = من غير routing)
+        self.ranges = None
+        self.range_gap = range_gap
+
+    def build_ranges(self, sheet_data):
+        ranges = SheetRanges(self.range_gap)
+        for sheet in self.sheets:
+            if sheet in sheet_data:
+                ranges.add_sheet(sheet, sheet_data[sheet][0])
+        logger.info(f"Sheet lot ranges: {ranges.summary()}")
+        return ranges
+
+    def refresh(self):
+        """تحديث البيانات لو المصدر اتغير - بترجع True لو النسخة اتغيرت"""
+        return False
+
+    def lookup(self, cert_lot_number):
+        raise NotImplementedError
+
+    def lookup_many(self, lot_numbers):
+        """بحث مجمّع: {lot: match أو None} - كلهم من نفس نسخة البيانات"""
+        return {lot: self.lookup(lot) for lot in lot_numbers}
+
+    def lot_keys(self):
+        """كل أرقام اللوت بترتيب الأولوية (لفهرس الاقتراحات)"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ExcelBackend(ERPBackend):
+    """
+    البحث في ملف الإكسيل نفسه: الأعمدة التلاتة بتتقري في فهرس hash في الذاكرة.
+
+    لما الملف يتغير الشيتات اللي اتغيرت بس هي اللي بتتقري تاني، والباقي من
+    الـ snapshot أو من الذاكرة، وبعدين الفهرس بيتبدل مرة واحدة.
+    """
+
+    name = 'excel'
+
+    def __init__(self, excel_path, sheets, column_names, use_snapshot=True, loader_workers=0, range_gap=1000):
+        super().__init__(range_gap)
+        self.excel_path = excel_path
+        self.sheets = sheets
+        self.column_names = column_names
+        self.lot_index = None
+        # الأعمدة بتفضل في الذاكرة بس لو مفيش snapshot نرجعلها وقت التحديث
+        self.sheet_data = None
+        self.workbook_state = None
+        self.load_lock = threading.Lock()
+        self.use_snapshot = use_snapshot
+        self.snapshot = ERPSnapshot(excel_path, column_names)
+        self.loader = WorkbookColumnLoader(excel_path, column_names, loader_workers)
+
+    def build_lot_index(self, sheet_data):
+        """بناء فهرس اللوت لكل الشيتات مرة واحدة لكل ملف محمّل"""
+        start = time.perf_counter()
+        index = LotIndex(self.sheets)
+        for sheet in self.sheets:
+            if sheet in sheet_data:
+                index.add_sheet(sheet, *sheet_data[sheet])
+        index.finalize()
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Lot index built: {len(index)} keys from {index.rows} rows "
+                    f"in {len(index.sheets_loaded)} sheet(s), {len(index.suppliers)} supplier(s), "
+                    f"~{index.memory_bytes() / 1024 / 1024:.1f} MB ({elapsed:.2f}s)")
+        return index
+
+    def workbook_changed(self):
+        """فحص سريع بالحجم و mtime: الإكسيل اتغير من آخر تحميل؟"""
+        state = self.workbook_state
+        if state is None:
+            return True
+        try:
+            st = os.stat(self.excel_path)
+        except OSError:
+            return False
+        return (st.st_size, st.st_mtime_ns) != (state['size'], state['mtime_ns'])
+
+    def refresh(self):
+        """
+        لو ملف الإكسيل اتغير: قراءة الشيتات اللي اتغيرت بس، وبعدين تبديل الفهرس مرة واحدة
+        بترجع True لو الفهرس اتبدل
+        """
+        if self.lot_index is not None and not self.workbook_changed():
+            return False
+
+        with self.load_lock:
+            try:
+                return self.sync_workbook()
+            except Exception as e:
+                # الإكسيل ممكن يكون بيتحفظ دلوقتي - نكمل بالبيانات الحالية ونجرب الدورة الجاية
+                logger.error(f"Error loading ERP workbook, keeping current data: {e}")
+                return False
+
+    def sync_workbook(self):
+        st = os.stat(self.excel_path)
+        state = self.workbook_state
+        if state is None and self.use_snapshot:
+            state = self.snapshot.load_state()
+
+        if state is not None and (st.st_size, st.st_mtime_ns) == (state['size'], state['mtime_ns']):
+            file_hash, fingerprint, changed = state['hash'], state.get('fingerprint'), []
+        else:
+            file_hash = FileUtils.get_file_hash(self.excel_path)
+            if state is not None and file_hash == state['hash']:
+                # الملف اتحفظ من غير تعديل
+                fingerprint, changed = state.get('fingerprint'), []
+            else:
+                previous = WorkbookFingerprint.from_dict(state.get('fingerprint')) if state else None
+                try:
+                    current = WorkbookFingerprint.read(self.excel_path, previous)
+                    fingerprint = current.to_dict()
+                    changed = current.changed_sheets(previous, self.sheets)
+                except (zipfile.BadZipFile, KeyError, ET.ParseError):
+                    fingerprint, changed = None, list(self.sheets)
+
+        # شيتات اتضافت للإعدادات بعد آخر تحميل
+        tried = state.get('sheets', []) if state else []
+        changed += [sheet for sheet in self.sheets if sheet not in tried and sheet not in changed]
+
+        new_state = {
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'hash': file_hash,
+            'sheets': list(self.sheets),
+            'fingerprint': fingerprint,
+            'loaded': state.get('loaded', []) if state else [],
+        }
+
+        if self.lot_index is not None and not changed:
+            if self.use_snapshot and new_state != state:
+                self.snapshot.save(new_state, {}, [])
+            self.workbook_state = new_state
+            return False
+
+        # الشيتات اللي متغيرتش: من الذاكرة أو من الـ snapshot
+        unchanged = [sheet for sheet in new_state['loaded'] if sheet in self.sheets and sheet not in changed]
+        if self.sheet_data is not None:
+            new_data = {sheet: self.sheet_data[sheet] for sheet in unchanged if sheet in self.sheet_data}
+        elif self.use_snapshot:
+            start = time.perf_counter()
+            new_data = self.snapshot.load_sheets(unchanged)
+            elapsed = (time.perf_counter() - start) * 1000
+            logger.info(f"ERP snapshot loaded: {len(new_data)} sheet(s) in {elapsed:.0f}ms")
+        else:
+            new_data = {}
+        changed += [sheet for sheet in unchanged if sheet not in new_data]
+
+        if changed:
+            logger.info(f"ERP sheet(s) read from workbook: {changed}")
+        for sheet, columns in self.loader.load(changed).items():
+            if columns is not None:
+                new_data[sheet] = columns
+        new_state['loaded'] = [sheet for sheet in self.sheets if sheet in new_data]
+
+        index = self.build_lot_index(new_data)
+        ranges = self.build_ranges(new_data)
+        if not index.sheets_loaded:
+            logger.error(f"No ERP sheets loaded from {self.excel_path}")
+
+        if self.use_snapshot:
+            self.snapshot.save(new_state, new_data, changed)
+
+        index.version = self.version + 1
+
+        # التبديل بعد ما كل حاجة تجهز - البحث يا يشوف القديم كله يا الجديد كله
+        self.sheet_data = None if self.use_snapshot else new_data
+        self.workbook_state = new_state
+        self.lot_index = index
+        self.ranges = ranges
+        self.version = index.version
+        return True
+
+    def get_lot_index(self):
+        """الفهرس الحالي - بيتبني أول مرة بس، والتحديث من refresh"""
+        if self.lot_index is None:
+            self.refresh()
+        if self.lot_index is None:
+            return LotIndex(self.sheets)
+        return self.lot_index
+
+    def lookup(self, cert_lot_number):
+        return self.get_lot_index().lookup(cert_lot_number)
+
+    def lookup_many(self, lot_numbers):
+        index = self.get_lot_index()
+        return {lot: index.lookup(lot) for lot in lot_numbers}
+
+    def lot_keys(self):
+        return list(self.get_lot_index().exact)
+
+
+def create_backend(config, excel_path, sheets, column_names, backend=None):
+    """الـ backend اللي في erp.backend في config.yaml (excel هو الافتراضي)"""
+    excel_config = config.get('excel', {})
+    erp_config = config.get('erp', {})
+    backend = backend or erp_config.get('backend', 'excel')
+    loader_workers = excel_config.get('loader_workers', 0)
+    range_gap = excel_config.get('range_gap', 1000)
+
+    if backend == 'sqlite':
+        from utils.erp_sqlite import SQLiteBackend
+        base_dir = config.get('paths', {}).get('base_dir', '.')
+        return SQLiteBackend(
+            os.path.join(base_dir, erp_config.get('sqlite_path', 'Raw_Warehouses.db')),
+            sheets,
+            pool_size=erp_config.get('pool_size', 4),
+            excel_path=excel_path,
+            column_names=column_names,
+            loader_workers=loader_workers,
+            auto_import=erp_config.get('import_from_excel', True),
+            range_gap=range_gap,
+        )
+
+    if backend != 'excel':
+        logger.warning(f"Unknown ERP backend '{backend}', using excel")
+    return ExcelBackend(
+        excel_path, sheets, column_names,
+        use_snapshot=excel_config.get('snapshot', True),
+        loader_workers=loader_workers,
+        range_gap=range_gap,
+    )
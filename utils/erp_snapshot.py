@@ -0,0 +1,121 @@
+# erp_snapshot.py - نسخة مجمّعة من أعمدة ملف ERP عشان التشغيل يبقى سريع
+import os
+import json
+import sqlite3
+import logging
+
+logger = logging.getLogger('CertPrintAgent')
+
+SNAPSHOT_FORMAT = 3
+
+
+class ERPSnapshot:
+    """
+    ملف SQLite جنب ملف الإكسيل فيه الأعمدة التلاتة بس لكل شيت.
+
+    مع النسخة بتتحفظ حالة الإكسيل اللي اتبنت منه (الحجم، mtime، الـ hash
+    وبصمة كل شيت)، و ERPAgent هو اللي بيقرر إيه اللي لازم يتقري تاني.
+    """
+
+    def __init__(self, excel_path, column_names):
+        base, _ = os.path.splitext(excel_path)
+        self.excel_path = excel_path
+        self.snapshot_path = f"{base}.snapshot.db"
+        # لو أسماء الأعمدة اتغيرت في الإعدادات النسخة القديمة متنفعش
+        self.layout = json.dumps({'format': SNAPSHOT_FORMAT, 'columns': column_names}, sort_keys=True)
+
+    def connect(self):
+        conn = sqlite3.connect(self.snapshot_path)
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sheets (
+                name TEXT PRIMARY KEY,
+                row_count INTEGER,
+                cert_lots TEXT,
+                suppliers TEXT,
+                internal_lots TEXT
+            )
+        """)
+        return conn
+
+    def load_state(self):
+        """حالة الإكسيل اللي آخر نسخة اتبنت منها، أو None"""
+        if not os.path.exists(self.snapshot_path):
+            return None
+
+        try:
+            conn = self.connect()
+            try:
+                meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning(f"ERP snapshot unreadable, rebuilding: {e}")
+            return None
+
+        if meta.get('layout') != self.layout or 'state' not in meta:
+            return None
+        return json.loads(meta['state'])
+
+    def load_sheets(self, sheet_names):
+        """
+        تحميل شيتات معينة من النسخة
+        بيرجع {sheet: (cert_lots, suppliers, internal_lots)} - الشيت اللي مش موجود بيتساب
+        """
+        sheet_names = list(sheet_names)
+        if not sheet_names:
+            return {}
+
+        sheets = {}
+        try:
+            conn = self.connect()
+            try:
+                rows = conn.execute(
+                    f"SELECT name, cert_lots, suppliers, internal_lots FROM sheets "
+                    f"WHERE name IN ({','.join('?' * len(sheet_names))})",
+                    sheet_names
+                )
+                for name, cert_lots, suppliers, internal_lots in rows:
+                    sheets[name] = (json.loads(cert_lots), json.loads(suppliers), json.loads(internal_lots))
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning(f"ERP snapshot unreadable, rebuilding: {e}")
+        return sheets
+
+    def save(self, state, sheet_data, changed_sheets):
+        """حفظ الحالة + الشيتات اللي اتقرت من جديد، ومسح الشيتات اللي مبقتش موجودة"""
+        loaded = state.get('loaded', [])
+        try:
+            conn = self.connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM meta")
+                    if loaded:
+                        conn.execute(
+                            f"DELETE FROM sheets WHERE name NOT IN ({','.join('?' * len(loaded))})",
+                            loaded
+                        )
+                    else:
+                        conn.execute("DELETE FROM sheets")
+
+                    for name in changed_sheets:
+                        if name not in sheet_data:
+                            continue
+                        cert_lots, suppliers, internal_lots = sheet_data[name]
+                        conn.execute(
+                            "INSERT OR REPLACE INTO sheets VALUES (?, ?, ?, ?, ?)",
+                            (name, len(cert_lots), json.dumps(cert_lots, ensure_ascii=False),
+                             json.dumps(suppliers, ensure_ascii=False),
+                             json.dumps(internal_lots, ensure_ascii=False))
+                        )
+                    conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                        ('layout', self.layout),
+                        ('state', json.dumps(state, ensure_ascii=False)),
+                    ])
+            finally:
+                conn.close()
+            if changed_sheets:
+                logger.info(f"ERP snapshot saved: {self.snapshot_path}")
+        except Exception as e:
+            logger.warning(f"Could not save ERP snapshot: {e}")
@@ -0,0 +1,250 @@
+# erp_sqlite.py - جدول اللوت في قاعدة SQLite بدل الإكسيل
+import os
+import json
+import time
+import queue
+import sqlite3
+import threading
+import logging
+from contextlib import contextmanager
+
+from utils.file_utils import FileUtils
+from utils.erp_backend import ERPBackend
+from utils.sheet_ranges import SheetRanges
+from utils.xlsx_loader import WorkbookColumnLoader
+
+logger = logging.getLogger('CertPrintAgent')
+
+LOTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        sheet_rank INTEGER,
+        row_no INTEGER,
+        sheet TEXT,
+        cert_lot TEXT,
+        stripped TEXT,
+        supplier TEXT,
+        internal_lot TEXT
+    )
+"""
+LOTS_INDEX = "CREATE INDEX IF NOT EXISTS lots_stripped ON lots (stripped, sheet_rank, row_no)"
+
+# كل الصفوف اللي ممكن تطابق ليها نفس الرقم من غير أصفار؛ أول شيت، وجواه التام الأول، وبعدين أول صف
+LOOKUP_SQL = """
+    SELECT sheet, supplier, internal_lot FROM lots
+    WHERE stripped = ?
+    ORDER BY sheet_rank, cert_lot = ? DESC, row_no
+    LIMIT 1
+"""
+KEYS_SQL = "SELECT cert_lot FROM lots ORDER BY sheet_rank, row_no"
+
+
+class ConnectionPool:
+    """
+    connections للقراءة بس، بتتفتح وقت الحاجة لحد size وبترجع للـ pool بعد الاستخدام.
+    sqlite3 بيحتفظ بالـ statements المجهزة لكل connection (cached_statements)،
+    فنفس الـ SQL مش بيتعمله parse تاني طول ما الـ connection عايشة.
+    """
+
+    def __init__(self, db_path, size=4):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(self.size)
+
+    def open(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=64)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        self.slots.acquire()
+        try:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                conn = self.open()
+            try:
+                yield conn
+            finally:
+                self.idle.put(conn)
+        finally:
+            self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class SQLiteBackend(ERPBackend):
+    """
+    جدول واحد فيه كل صفوف الشيتات ومعاه index على (الرقم من غير أصفار، الشيت، الصف)،
+    فالبحث probe واحد في الـ index بنفس قواعد الإكسيل.
+
+    البيانات بتدخل بـ import_workbook من ملف الإكسيل في transaction واحدة (WAL)،
+    والبحث اللي شغال وقتها بيشوف النسخة القديمة كلها لحد ما الـ import يخلص.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, db_path, sheets, pool_size=4, excel_path=None, column_names=None,
+                 loader_workers=0, auto_import=True, range_gap=1000):
+        super().__init__(range_gap)
+        self.db_path = db_path
+        self.sheets = sheets
+        self.excel_path = excel_path
+        self.column_names = column_names or {}
+        self.loader_workers = loader_workers
+        self.auto_import = auto_import
+        self.load_lock = threading.Lock()
+        self.init_schema()
+        self.pool = ConnectionPool(db_path, pool_size)
+
+    def writer(self):
+        # autocommit - الـ transactions بتتفتح بإيدنا عشان الـ DDL يبقى جواها
+        return sqlite3.connect(self.db_path, isolation_level=None)
+
+    def init_schema(self):
+        conn = self.writer()
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute(LOTS_TABLE.format(name='lots'))
+            conn.execute(LOTS_INDEX)
+        finally:
+            conn.close()
+
+    def read_meta(self):
+        with self.pool.connection() as conn:
+            return dict(conn.execute("SELECT key, value FROM meta").fetchall())
+
+    def source_changed(self, meta):
+        """الإكسيل اتغير من آخر import؟ (الحجم و mtime الأول، وبعدين الـ hash)"""
+        if not self.excel_path or not os.path.exists(self.excel_path):
+            return False
+        if json.loads(meta.get('sheets', '[]')) != list(self.sheets):
+            return True
+        source = json.loads(meta.get('source', 'null'))
+        if source is None or source.get('columns') != self.column_names:
+            return True
+
+        st = os.stat(self.excel_path)
+        if (st.st_size, st.st_mtime_ns) == (source['size'], source['mtime_ns']):
+            return False
+        if FileUtils.get_file_hash(self.excel_path) != source['hash']:
+            return True
+
+        # الملف اتحفظ من غير تعديل - نحدّث الحالة بس من غير import
+        source.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+        conn = self.writer()
+        try:
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('source', ?)", (json.dumps(source),))
+        finally:
+            conn.close()
+        return False
+
+    def import_workbook(self):
+        """قراءة الشيتات من الإكسيل وتبديل جدول اللوت كله في transaction واحدة"""
+        if not self.excel_path or not os.path.exists(self.excel_path):
+            raise FileNotFoundError(f"ERP workbook not found: {self.excel_path}")
+
+        start = time.perf_counter()
+        st = os.stat(self.excel_path)
+        source = {
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'hash': FileUtils.get_file_hash(self.excel_path),
+            'columns': self.column_names,
+        }
+        loader = WorkbookColumnLoader(self.excel_path, self.column_names, self.loader_workers)
+        sheet_data = {sheet: columns for sheet, columns in loader.load(self.sheets).items() if columns is not None}
+        ranges = self.build_ranges(sheet_data)
+
+        def rows():
+            for rank, sheet in enumerate(self.sheets):
+                if sheet not in sheet_data:
+                    continue
+                for row_no, (cert_lot, supplier, internal_lot) in enumerate(zip(*sheet_data[sheet])):
+                    yield rank, row_no, sheet, cert_lot, cert_lot.lstrip('0'), supplier, internal_lot
+
+        conn = self.writer()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DROP TABLE IF EXISTS lots_import")
+                conn.execute(LOTS_TABLE.format(name='lots_import'))
+                conn.executemany("INSERT INTO lots_import VALUES (?, ?, ?, ?, ?, ?, ?)", rows())
+                conn.execute("DROP TABLE lots")
+                conn.execute("ALTER TABLE lots_import RENAME TO lots")
+                conn.execute(LOTS_INDEX)
+
+                version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+                version = int(version[0]) + 1 if version else 1
+                conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+                    ('version', str(version)),
+                    ('sheets', json.dumps(list(self.sheets), ensure_ascii=False)),
+                    ('source', json.dumps(source, ensure_ascii=False)),
+                    ('ranges', json.dumps(ranges.to_dict(), ensure_ascii=False)),
+                ])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            row_count = conn.execute("SELECT COUNT(*) FROM lots").fetchone()[0]
+        finally:
+            conn.close()
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"ERP database imported: {row_count} rows from {len(sheet_data)} sheet(s) "
+                    f"into {self.db_path} ({elapsed:.2f}s)")
+        return version
+
+    def refresh(self):
+        """import تاني لو الإكسيل اتغير، وبعدين قراءة نسخة القاعدة - True لو اتغيرت"""
+        with self.load_lock:
+            try:
+                meta = self.read_meta()
+                if self.auto_import and self.source_changed(meta):
+                    self.import_workbook()
+                    meta = self.read_meta()
+            except Exception as e:
+                logger.error(f"Error refreshing ERP database, keeping current data: {e}")
+                return False
+
+        version = int(meta.get('version', 0))
+        if version == self.version:
+            return False
+        if meta.get('sheets') and json.loads(meta['sheets']) != list(self.sheets):
+            logger.warning(f"ERP database sheets {json.loads(meta['sheets'])} differ from config {self.sheets}")
+        ranges = SheetRanges.from_dict(json.loads(meta.get('ranges', 'null')))
+        # النطاقات لازم تكون محسوبة بنفس ترتيب الشيتات، وإلا من غير routing
+        self.ranges = ranges if ranges is not None and ranges.sheets == [
+            sheet for sheet in self.sheets if sheet in ranges.sheets
+        ] else None
+        self.version = version
+        logger.info(f"ERP database {self.db_path} at version {version}")
+        return True
+
+    def lookup(self, cert_lot_number):
+        lot_str = str(cert_lot_number).strip()
+        with self.pool.connection() as conn:
+            return conn.execute(LOOKUP_SQL, (lot_str.lstrip('0'), lot_str)).fetchone()
+
+    def lookup_many(self, lot_numbers):
+        # connection واحدة ونفس الـ statement المجهز لكل اللوتات
+        results = {}
+        with self.pool.connection() as conn:
+            for lot in lot_numbers:
+                lot_str = str(lot).strip()
+                results[lot] = conn.execute(LOOKUP_SQL, (lot_str.lstrip('0'), lot_str)).fetchone()
+        return results
+
+    def lot_keys(self):
+        with self.pool.connection() as conn:
+            return list(dict.fromkeys(row[0] for row in conn.execute(KEYS_SQL)))
+
+    def close(self):
+        self.pool.close()
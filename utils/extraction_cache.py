@@ -0,0 +1,98 @@
+# extraction_cache.py - نتايج الاستخراج محفوظة في SQLite عشان الملفات اللي فاضلة في الـ inbox
+import json
+import sqlite3
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger('CertPrintAgent')
+
+
+class ExtractionCache:
+    """
+    نتيجة الاستخراج لكل ملف بالـ (الاسم، الحجم، mtime) - الملف اللي فاضل في
+    الـ inbox (طباعة فشلت، مستني حد يراجعه) مش بيتقري تاني كل دورة. الملفات
+    اللي ملهاش لوت بتتحفظ برضه (من غير نتيجة). أخطاء القراية مش بتتحفظ.
+
+    grammar بيتغير مع أنماط الاستخراج أو ليستة المنتجات أو المراحل الشغالة،
+    ولما يتغير كل النتايج القديمة بتتمسح.
+    """
+
+    def __init__(self, db_path, grammar, max_age_days=30):
+        self.db_path = db_path
+        self.grammar = grammar
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS extractions (
+                file_name TEXT,
+                size INTEGER,
+                mtime_ns INTEGER,
+                grammar TEXT,
+                result TEXT,
+                error TEXT,
+                created TEXT,
+                PRIMARY KEY (file_name, size, mtime_ns)
+            )
+        """)
+        stale = self.conn.execute("DELETE FROM extractions WHERE grammar != ?", (grammar,)).rowcount
+        if stale:
+            logger.info(f"Extraction cache: {stale} result(s) from an older grammar dropped")
+        if max_age_days:
+            cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat(timespec='seconds')
+            self.conn.execute("DELETE FROM extractions WHERE created < ?", (cutoff,))
+        self.conn.commit()
+        self.pending_writes = 0
+        self.stats = {}
+        self.start_cycle()
+
+    def start_cycle(self):
+        self.stats = {'hits': 0, 'failure_hits': 0, 'misses': 0}
+
+    @staticmethod
+    def key(file_name, signature):
+        size, mtime_ns = signature[0], signature[1]
+        return file_name, size, mtime_ns
+
+    def get(self, file_name, signature):
+        """(True, النتيجة أو None لو الملف ملهوش لوت، الخطأ) أو (False, None, None)"""
+        row = self.conn.execute(
+            "SELECT result, error FROM extractions WHERE file_name = ? AND size = ? AND mtime_ns = ?",
+            self.key(file_name, signature)
+        ).fetchone()
+        if row is None:
+            self.stats['misses'] += 1
+            return False, None, None
+        if row[0] is None:
+            self.stats['failure_hits'] += 1
+            return True, None, row[1]
+        self.stats['hits'] += 1
+        return True, json.loads(row[0]), None
+
+    def put(self, file_name, signature, result, error=None):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO extractions VALUES (?, ?, ?, ?, ?, ?, ?)",
+            self.key(file_name, signature) + (
+                self.grammar,
+                json.dumps(result, ensure_ascii=False) if result is not None else None,
+                error,
+                datetime.now().isoformat(timespec='seconds'),
+            )
+        )
+        self.pending_writes += 1
+        if self.pending_writes >= 100:
+            self.flush()
+
+    def flush(self):
+        if self.pending_writes:
+            self.conn.commit()
+            self.pending_writes = 0
+
+    def hit_rate(self):
+        hits = self.stats['hits'] + self.stats['failure_hits']
+        total = hits + self.stats['misses']
+        return hits / total if total else 0.0
+
+    def close(self):
+        self.flush()
+        self.conn.close()
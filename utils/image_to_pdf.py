@@ -0,0 +1,177 @@
+# image_to_pdf.py - تحويل صور الشهادات (jpg/png/tiff...) لـ PDF صفحة واحدة
+import os
+import time
+import shutil
+import logging
+from datetime import datetime
+from concurrent.futures import TimeoutError
+
+from utils.file_utils import FileUtils
+from utils.worker_pool import WorkerPool
+
+try:
+    from PIL import Image, ImageOps
+    PILLOW_AVAILABLE = True
+except ImportError:
+    PILLOW_AVAILABLE = False
+
+logger = logging.getLogger('CertPrintAgent')
+
+# نفس الامتدادات اللي OutlookAgent.is_certificate_file بيحفظها
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp', '.gif')
+# التعليق بيتكتب بإحداثيات A4 ثابتة، فالصورة بتتحط في صفحة A4
+A4_INCHES = (8.27, 11.69)
+
+
+def is_image(path):
+    return path.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def convert_image(image_path, pdf_path, dpi, quality):
+    """
+    شغل الـ worker: أول frame من الصورة متصغرة (أو متكبرة) على قد صفحة A4 بالـ
+    dpi المطلوب ومضغوطة JPEG. بترجع (الأبعاد الأصلية، الأبعاد الجديدة، الثواني)
+    """
+    start = time.perf_counter()
+    page_size = (round(A4_INCHES[0] * dpi), round(A4_INCHES[1] * dpi))
+    with Image.open(image_path) as img:
+        img.seek(0)  # gif/tiff: الصفحة الأولى بس
+        original_size = img.size
+        img = ImageOps.exif_transpose(img)  # صور الموبايل المتلفة
+
+        alpha = img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info)
+        mode = 'L' if img.mode in ('1', 'L', 'LA', 'I', 'I;16', 'F') else 'RGB'
+        img = img.convert('RGBA' if alpha else mode)
+        img = ImageOps.contain(img, page_size, Image.LANCZOS)
+
+        page = Image.new(mode, page_size, 'white')
+        offset = ((page_size[0] - img.width) // 2, (page_size[1] - img.height) // 2)
+        page.paste(img, offset, img if alpha else None)
+
+    # الكتابة في ملف مؤقت وبعدين rename - ملف نصه مكتوب عمره ما يبان في الكاش
+    tmp_path = pdf_path + '.part'
+    page.save(tmp_path, 'PDF', resolution=dpi, quality=quality)
+    os.replace(tmp_path, pdf_path)
+    return original_size, img.size, time.perf_counter() - start
+
+
+class ImageConverter:
+    """
+    بيحول صور الشهادات اللي في الـ inbox لـ PDF في process pool. الـ PDF
+    بيتحفظ في cache_dir باسم الـ hash بتاع الصورة، فنفس الصورة (حتى لو جت في
+    إيميل تاني باسم تاني) مش بتتحول مرتين. النسخة بتتحط في الـ inbox باسم
+    الصورة (عشان اللوت في الاسم) والصورة الأصلية بتتنقل للأرشيف.
+    """
+
+    def __init__(self, cache_dir, archive_dir, dpi=200, quality=75, workers=2, timeout=60):
+        self.cache_dir = cache_dir
+        self.archive_dir = archive_dir
+        self.dpi = dpi
+        self.quality = quality
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.pool = None
+        self.stats = {'converted': 0, 'cached': 0, 'errors': 0, 'seconds': 0.0}
+
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = WorkerPool(self.workers, self.timeout)
+        return self.pool
+
+    def reset_pool(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def submit(self, image_paths):
+        """الصور اللي ملهاش PDF في الكاش بتتبعت للـ pool على طول - بترجع jobs لـ collect"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        jobs = []
+        running = {}  # نفس الصورة مرتين في نفس الدفعة: تحويل واحد
+        for path in image_paths:
+            try:
+                key = FileUtils.get_file_hash(path)
+            except OSError as e:
+                jobs.append((path, None, None, f"Unreadable image: {e}"))
+                continue
+            cached = os.path.join(self.cache_dir, f"{key}.pdf")
+            if os.path.exists(cached):
+                os.utime(cached)  # التنضيف بيمسح اللي متستخدمش من مدة
+                jobs.append((path, cached, None, None))
+                continue
+            future = running.get(cached)
+            if future is None:
+                future = running[cached] = self.get_pool().submit(convert_image, path, cached, self.dpi, self.quality)
+            jobs.append((path, cached, future, None))
+        return jobs
+
+    def collect(self, jobs):
+        """بتطلع (مسار الصورة، مسار الـ PDF في الـ inbox أو None، الخطأ أو None) بترتيب ما بتخلص"""
+        pending = {}
+        for path, cached, future, error in jobs:
+            if future is not None:
+                pending.setdefault(future, (cached, []))[1].append(path)
+            elif error is not None:
+                self.stats['errors'] += 1
+                yield path, None, error
+            else:
+                self.stats['cached'] += 1
+                yield self.publish(path, cached)
+
+        while pending:
+            # الصورة المعلقة بس هي اللي بتفشل - اللي كان مستني وراها بيكمل في pool جديد
+            for future in self.pool.wait(pending):
+                cached, paths = pending.pop(future)
+                try:
+                    original_size, new_size, seconds = future.result()
+                except TimeoutError:
+                    for path in paths:
+                        self.stats['errors'] += 1
+                        yield path, None, f"Image conversion timed out after {self.timeout}s"
+                    continue
+                except Exception as e:
+                    for path in paths:
+                        self.stats['errors'] += 1
+                        yield path, None, f"Image conversion failed: {e}"
+                    continue
+                self.stats['converted'] += 1
+                self.stats['seconds'] += seconds
+                for i, path in enumerate(paths):
+                    if i == 0:
+                        logger.info(f"Converted {os.path.basename(path)}: {original_size[0]}x{original_size[1]} -> "
+                                    f"{new_size[0]}x{new_size[1]} @ {self.dpi} dpi, "
+                                    f"{os.path.getsize(path) // 1024} KB -> {os.path.getsize(cached) // 1024} KB "
+                                    f"in {seconds:.2f}s")
+                    else:
+                        self.stats['cached'] += 1
+                    yield self.publish(path, cached)
+
+    def publish(self, image_path, cached):
+        """نسخة الـ PDF في الـ inbox مكان الصورة، والصورة للأرشيف"""
+        inbox = os.path.dirname(image_path)
+        base_name = os.path.splitext(os.path.basename(image_path))[0]
+        pdf_path = os.path.join(inbox, FileUtils.create_unique_filename(base_name, inbox, '.pdf'))
+        try:
+            shutil.copyfile(cached, pdf_path)
+        except OSError as e:
+            self.stats['errors'] += 1
+            return image_path, None, f"Could not place converted PDF: {e}"
+
+        try:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            image_name = os.path.basename(image_path)
+            archive_path = os.path.join(self.archive_dir, image_name)
+            if os.path.exists(archive_path):
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_")
+                archive_path = os.path.join(self.archive_dir, timestamp + image_name)
+            shutil.move(image_path, archive_path)
+        except OSError as e:
+            # الصورة فاضلة في الـ inbox وهتتحول تاني - من غير كده كانت هتتطبع مرتين
+            os.remove(pdf_path)
+            self.stats['errors'] += 1
+            return image_path, None, f"Could not archive image: {e}"
+        return image_path, pdf_path, None
+
+    def prune_cache(self, max_age_days):
+        if max_age_days:
+            FileUtils.clean_temp_files(self.cache_dir, max_age_hours=max_age_days * 24)
@@ -0,0 +1,122 @@
+# inbox_scanner.py - قراية فولدر الشهادات مرة واحدة في الدورة مع حالة كل ملف
+import os
+import logging
+from datetime import datetime
+
+logger = logging.getLogger('CertPrintAgent')
+
+
+class InboxScanner:
+    """
+    بيقرا Cert_Inbox بـ os.scandir مرة واحدة في الدورة ويفتكر لكل ملف
+    (الحجم، وقت التعديل، الـ inode) من دورة للتانية.
+
+    الملف اللي الاستخراج فشل فيه بيتجرب تاني لحد max_failures مرة وبعدين بيدخل
+    الـ quarantine: بيفضل في الفولدر بس مش بيتبعت للاستخراج تاني لحد ما يتغير
+    (يتحفظ من جديد أو يتغير اسمه). الملف اللي اتعالج بيتنقل من الفولدر، ولو
+    فضل (الطباعة أو الـ ERP وقعوا مثلاً) بيتبعت تاني في الدورة الجاية زي الأول.
+    """
+
+    def __init__(self, inbox_dir, extensions=('.pdf',), max_failures=3):
+        self.inbox_dir = inbox_dir
+        self.extensions = tuple(e.lower() for e in extensions)
+        self.max_failures = max_failures
+        self.entries = {}
+        self.last_scan = {'files': 0, 'pending': 0, 'quarantined': 0}
+
+    def read_dir(self):
+        """اسم الملف ← (المسار، التوقيع) - قراية واحدة للفولدر"""
+        current = {}
+        with os.scandir(self.inbox_dir) as it:
+            for entry in it:
+                if not entry.name.lower().endswith(self.extensions):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue  # الملف اتشال وإحنا بنقرا
+                # على ويندوز st_ino بيرجع 0 من scandir من غير stat زيادة - الحجم والوقت كفاية
+                current[entry.name] = (entry.path, (st.st_size, st.st_mtime_ns, st.st_ino))
+        return current
+
+    def scan(self):
+        """مسارات الملفات اللي محتاجة استخراج: الجديدة والمتغيرة واللي لسه متنقلتش"""
+        try:
+            current = self.read_dir()
+        except FileNotFoundError:
+            logger.error(f"Inbox not found: {self.inbox_dir}")
+            self.entries = {}
+            return []
+
+        # الملفات اللي اتنقلت أو اتمسحت
+        for name in self.entries.keys() - current.keys():
+            del self.entries[name]
+
+        now = datetime.now().isoformat(timespec='seconds')
+        pending = []
+        quarantined = 0
+        for name, (path, signature) in current.items():
+            state = self.entries.get(name)
+            if state is None or state['signature'] != signature:
+                if state is not None and state['quarantined']:
+                    logger.info(f"Quarantined file changed, retrying: {name}")
+                state = self.entries[name] = {
+                    'signature': signature, 'failures': 0, 'quarantined': False,
+                    'first_seen': now, 'last_error': None,
+                }
+            state['path'] = path
+            if state['quarantined']:
+                quarantined += 1
+                continue
+            pending.append(path)
+
+        self.last_scan = {'files': len(current), 'pending': len(pending), 'quarantined': quarantined}
+        return pending
+
+    def track(self, path):
+        """ملف اتعمل في الـ inbox جوه الدورة (PDF من صورة) - بيتعامل كأنه كان في الـ scan"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        self.entries[os.path.basename(path)] = {
+            'signature': (st.st_size, st.st_mtime_ns, st.st_ino), 'failures': 0, 'quarantined': False,
+            'first_seen': datetime.now().isoformat(timespec='seconds'), 'last_error': None, 'path': path,
+        }
+
+    def signature(self, path):
+        """(الحجم، mtime، inode) من آخر scan - من غير stat تاني"""
+        state = self.entries.get(os.path.basename(path))
+        return state['signature'] if state is not None else None
+
+    def record_success(self, path):
+        state = self.entries.get(os.path.basename(path))
+        if state is not None:
+            state['failures'] = 0
+            state['last_error'] = None
+
+    def record_failure(self, path, reason=None):
+        """فشل الاستخراج - بعد max_failures مرة الملف بيدخل الـ quarantine"""
+        name = os.path.basename(path)
+        state = self.entries.get(name)
+        if state is None:
+            return
+        state['failures'] += 1
+        state['last_error'] = reason
+        if not state['quarantined'] and state['failures'] >= self.max_failures:
+            state['quarantined'] = True
+            logger.warning(f"Quarantined {name} after {state['failures']} failed extraction(s) "
+                           f"({reason}) - rename or replace the file to retry")
+
+    def processed_files(self):
+        """مسارات ملفات آخر scan اللي الاستخراج منجحش فيها مش منها"""
+        return [state['path'] for state in self.entries.values() if state['failures'] == 0]
+
+    def quarantined(self):
+        return [
+            {'file_name': name, 'failures': state['failures'], 'last_error': state['last_error'],
+             'first_seen': state['first_seen']}
+            for name, state in self.entries.items() if state['quarantined']
+        ]
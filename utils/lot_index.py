@@ -0,0 +1,121 @@
+# lot_index.py - فهرس hash للبحث عن اللوت في ملف ERP
+import sys
+import logging
+from array import array
+
+logger = logging.getLogger('CertPrintAgent')
+
+
+class LotIndex:
+    """
+    فهرس لكل الشيتات مرة واحدة: رقم اللوت في الشهادة -> (sheet, supplier, internal_lot)
+
+    بيحتفظ بمفتاحين لكل صف: الرقم زي ما هو، والرقم من غير أصفار في البداية.
+    الشيتات بتتضاف بترتيب excel.sheets وأول شيت فيه الرقم هو اللي بيكسب،
+    زي البحث القديم بالظبط.
+
+    التخزين مضغوط: أسماء الموردين واللوت الداخلي في جداول نصوص من غير تكرار،
+    وكل صف محفوظ كأرقام في arrays (شيت، مورد، لوت داخلي).
+    """
+
+    def __init__(self, sheet_order):
+        self.sheet_order = list(sheet_order)
+        # رقم نسخة الفهرس - بيزيد مع كل تحميل جديد للإكسيل
+        self.version = 0
+        self.exact = {}
+        self.stripped = {}
+        self.sheets_loaded = []
+        self.rows = 0
+
+        # جداول النصوص + الأعمدة المضغوطة لكل record
+        self.suppliers = []
+        self.internal_lots = []
+        self.record_sheet = array('B')
+        self.record_supplier = array('I')
+        self.record_internal = array('I')
+        self._supplier_ids = {}
+        self._internal_ids = {}
+
+    def _intern(self, table, ids, value):
+        value_id = ids.get(value)
+        if value_id is None:
+            value_id = ids[value] = len(table)
+            table.append(value)
+        return value_id
+
+    def add_sheet(self, sheet_name, cert_lots, suppliers, internal_lots):
+        """إضافة شيت للفهرس - لازم بترتيب الأولوية"""
+        rank = len(self.sheets_loaded)
+        self.sheets_loaded.append(sheet_name)
+        exact, stripped = self.exact, self.stripped
+
+        for cert_lot, supplier, internal_lot in zip(cert_lots, suppliers, internal_lots):
+            self.rows += 1
+            stripped_key = cert_lot.lstrip('0')
+            # أول ظهور بس هو اللي بيتسجل (زي iloc[0])
+            if cert_lot in exact and stripped_key in stripped:
+                continue
+
+            record = len(self.record_sheet)
+            self.record_sheet.append(rank)
+            self.record_supplier.append(self._intern(self.suppliers, self._supplier_ids, supplier))
+            self.record_internal.append(self._intern(self.internal_lots, self._internal_ids, internal_lot))
+            exact.setdefault(cert_lot, record)
+            stripped.setdefault(stripped_key, record)
+
+    def finalize(self):
+        """
+        بعد آخر شيت: مفتاح من غير أصفار بيشاور على نفس record المفتاح التام
+        مش محتاج يتخزن مرتين، والـ lookup بيرجع للـ exact في الحالة دي
+        """
+        exact = self.exact
+        self.stripped = {
+            key: record for key, record in self.stripped.items()
+            if exact.get(key) != record
+        }
+        self._supplier_ids = {}
+        self._internal_ids = {}
+        return self
+
+    def record(self, record):
+        return (
+            self.sheets_loaded[self.record_sheet[record]],
+            self.suppliers[self.record_supplier[record]],
+            self.internal_lots[self.record_internal[record]],
+        )
+
+    def lookup(self, cert_lot_number):
+        """
+        البحث عن لوت: بيرجع (sheet, supplier, internal_lot) أو None
+
+        جوه نفس الشيت المطابقة التامة ليها الأولوية، وبعدين المطابقة من غير أصفار.
+        """
+        lot_str = str(cert_lot_number).strip()
+        stripped_key = lot_str.lstrip('0')
+        exact = self.exact.get(lot_str)
+        stripped = self.stripped.get(stripped_key)
+        if stripped is None:
+            stripped = self.exact.get(stripped_key)
+
+        # المطابقة التامة دايماً ليها مطابقة من غير أصفار في نفس الشيت أو قبله
+        if exact is not None and self.record_sheet[exact] <= self.record_sheet[stripped]:
+            return self.record(exact)
+        if stripped is not None:
+            return self.record(stripped)
+        return None
+
+    def memory_bytes(self):
+        """تقدير تقريبي للذاكرة اللي الفهرس واخدها"""
+        size = sys.getsizeof(self.exact) + sys.getsizeof(self.stripped)
+        size += sum(sys.getsizeof(k) for k in self.exact)
+        size += sum(sys.getsizeof(k) for k in self.stripped)
+        # أرقام الـ records نفسها (كل record بيتحسب مرة واحدة)
+        size += sys.getsizeof(0) * len(self.record_sheet)
+        for column in (self.record_sheet, self.record_supplier, self.record_internal):
+            size += column.buffer_info()[1] * column.itemsize
+        for table in (self.suppliers, self.internal_lots):
+            size += sys.getsizeof(table) + sum(sys.getsizeof(v) for v in table)
+        return size
+
+    def __len__(self):
+        return len(self.exact)
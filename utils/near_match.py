@@ -0,0 +1,119 @@
+# near_match.py - اقتراح لوتات قريبة للوت اللي ملقناهوش في الإكسيل
+import time
+import logging
+from array import array
+
+logger = logging.getLogger('CertPrintAgent')
+
+
+def edit_distance(a, b, max_distance):
+    """
+    مسافة Damerau (OSA): إضافة، حذف، تغيير، أو تبديل رقمين جنب بعض
+    بترجع max_distance + 1 لو المسافة أكبر من الحد
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    # الحالات السريعة: تغيير أو تبديل في نفس الطول، أو رقم ناقص/زيادة
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diffs) <= 1:
+            return len(diffs)
+        if len(diffs) == 2:
+            i, j = diffs
+            if j == i + 1 and a[i] == b[j] and a[j] == b[i]:
+                return 1
+            return min(2, max_distance + 1)
+    elif abs(len(a) - len(b)) == 1:
+        longer, shorter = (a, b) if len(a) > len(b) else (b, a)
+        i = 0
+        while i < len(shorter) and longer[i] == shorter[i]:
+            i += 1
+        if longer[i + 1:] == shorter[i:]:
+            return 1
+
+    prev_prev = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(prev[j] + 1, current[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], prev_prev[j - 2] + 1)
+        # التبديل بيقفز صف، فلازم الصفين يعدوا الحد
+        if min(current) > max_distance and min(prev) > max_distance:
+            return max_distance + 1
+        prev_prev, prev = prev, current
+    return min(prev[-1], max_distance + 1)
+
+
+def deletes(key):
+    """الرقم نفسه + كل الأشكال اللي فيها رقم واحد محذوف"""
+    variants = {key}
+    for i in range(len(key)):
+        variants.add(key[:i] + key[i + 1:])
+    return variants
+
+
+class NearMatchIndex:
+    """
+    فهرس deletion-neighbourhood لكل أرقام اللوت في كل الشيتات.
+
+    كل رقم بيتسجل هو وكل الأشكال اللي فيها رقم محذوف. وقت البحث بنعمل نفس
+    الحاجة للوت المطلوب ونقارن المرشحين بس بالمسافة الحقيقية. ده بيلقط الرقم
+    الغلط، الرقمين المتبدلين، والرقم الناقص أو الزيادة (مسافة 1)، وكمان الحالات
+    اللي مسافتها 2 وليها شكل محذوف مشترك.
+    """
+
+    def __init__(self, keys, lookup):
+        """keys: أرقام اللوت بترتيب الأولوية، lookup: بحث الـ backend عن رقم موجود"""
+        start = time.perf_counter()
+        self.lookup = lookup
+        self.keys = list(keys)
+        self.variants = {}
+
+        for key_id, key in enumerate(self.keys):
+            for variant in deletes(key):
+                ids = self.variants.get(variant)
+                if ids is None:
+                    ids = self.variants[variant] = array('I')
+                ids.append(key_id)
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Near-match index built: {len(self.keys)} lots, {len(self.variants)} variants ({elapsed:.2f}s)")
+
+    def suggest(self, cert_lot_number, max_distance=2, limit=5):
+        """
+        أقرب اللوتات الموجودة للوت المطلوب
+        بترجع list من dicts فيها cert_lot, distance, sheet, supplier, internal_lot
+        """
+        lot_str = str(cert_lot_number).strip()
+        candidates = set()
+        for variant in deletes(lot_str):
+            ids = self.variants.get(variant)
+            if ids is not None:
+                candidates.update(ids)
+
+        scored = []
+        for key_id in candidates:
+            key = self.keys[key_id]
+            if key == lot_str:
+                continue
+            distance = edit_distance(lot_str, key, max_distance)
+            if distance <= max_distance:
+                scored.append((distance, key_id, key))
+
+        # الأقرب الأول، وبعدين بترتيب الشيتات (key_id بيمشي بترتيب الإضافة)
+        scored.sort()
+        suggestions = []
+        for distance, _, key in scored[:limit]:
+            sheet, supplier, internal_lot = self.lookup(key)
+            suggestions.append({
+                'cert_lot': key,
+                'distance': distance,
+                'sheet': sheet,
+                'supplier': supplier,
+                'internal_lot': internal_lot,
+            })
+        return suggestions
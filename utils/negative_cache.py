@@ -0,0 +1,59 @@
+# negative_cache.py - اللوتات اللي مش موجودة في الإكسيل الحالي
+import logging
+from datetime import datetime
+
+logger = logging.getLogger('CertPrintAgent')
+
+
+class NegativeLotCache:
+    """
+    كاش للوتات اللي البحث عنها فشل، مربوط بنسخة الفهرس.
+
+    طول ما الإكسيل متغيرش اللوت ده بيترد عليه على طول إنه مش موجود. لما الفهرس
+    يتبني من جديد، اللوت بيتدور عليه تاني في أول طلب. عدد مرات الطلب بيفضل
+    محفوظ عشان نعرف أنهي لوتات ناقصة من الـ ERP بتتطلب أكتر.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+
+    @staticmethod
+    def key(cert_lot_number):
+        # البحث بيقارن من غير أصفار في البداية، فـ 0123 و 123 نفس النتيجة
+        return str(cert_lot_number).strip().lstrip('0')
+
+    def is_known_miss(self, cert_lot_number, version):
+        """لو اللوت فشل قبل كده في نفس نسخة الفهرس: بنسجل الطلب ونرجع True"""
+        entry = self.entries.get(self.key(cert_lot_number))
+        if entry is None or entry['version'] != version:
+            return False
+        entry['count'] += 1
+        entry['last_seen'] = datetime.now().isoformat(timespec='seconds')
+        self.hits += 1
+        return True
+
+    def record_miss(self, cert_lot_number, version):
+        now = datetime.now().isoformat(timespec='seconds')
+        key = self.key(cert_lot_number)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = {'lot': str(cert_lot_number).strip(), 'count': 0, 'first_seen': now}
+        entry['count'] += 1
+        entry['last_seen'] = now
+        entry['version'] = version
+
+    def record_found(self, cert_lot_number):
+        """اللوت اتضاف للإكسيل - نشيله من الكاش"""
+        entry = self.entries.pop(self.key(cert_lot_number), None)
+        if entry is not None:
+            logger.info(f"Lot {entry['lot']} now found in ERP after {entry['count']} failed request(s) "
+                        f"since {entry['first_seen']}")
+
+    def most_requested(self, limit=10):
+        """اللوتات الناقصة مترتبة بعدد مرات الطلب"""
+        entries = sorted(self.entries.values(), key=lambda e: e['count'], reverse=True)
+        return entries[:limit]
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,110 @@
+# ocr.py - OCR للشهادات الممسوحة (من غير طبقة نص) بـ Tesseract محلي
+import os
+import time
+import shutil
+import logging
+from utils.pdf_text import PdfTextReader, PYMUPDF_AVAILABLE
+from utils.worker_pool import WorkerPool
+
+try:
+    import pytesseract
+    from PIL import Image
+    OCR_AVAILABLE = PYMUPDF_AVAILABLE
+except ImportError:
+    OCR_AVAILABLE = False
+
+if PYMUPDF_AVAILABLE:
+    import fitz
+
+logger = logging.getLogger('CertPrintAgent')
+
+# أعلى الصفحة: جدول البيانات اللي فيه رقم اللوت في أغلب الشهادات
+DEFAULT_REGION = (0.0, 0.0, 1.0, 0.4)
+
+
+def find_tesseract(configured_path, base_dir='.'):
+    """tesseract.exe المحلي (ocr.tesseract_path) ولو مش موجود اللي على الـ PATH"""
+    if configured_path:
+        path = configured_path if os.path.isabs(configured_path) else os.path.join(base_dir, configured_path)
+        if os.path.isfile(path):
+            return os.path.abspath(path)
+    return shutil.which('tesseract')
+
+
+def init_ocr_worker(tesseract_cmd):
+    """بيتنفذ مرة في كل worker"""
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    tessdata = os.path.join(os.path.dirname(tesseract_cmd), 'tessdata')
+    if os.path.isdir(tessdata):
+        os.environ.setdefault('TESSDATA_PREFIX', tessdata)
+    # الـ pool أصلاً بعدد الـ cores - tesseract متعدد الـ threads هيزحم بعضه
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    # الـ process الأساسي هو اللي بيسجل نتيجة كل ملف
+    logging.getLogger('CertPrintAgent').setLevel(logging.CRITICAL)
+
+
+def ocr_pixmap(pixmap, language):
+    image = Image.frombytes('L', (pixmap.width, pixmap.height), pixmap.samples)
+    return pytesseract.image_to_string(image, lang=language)
+
+
+def ocr_first_page(pdf_path, settings):
+    """
+    شغل الـ worker: الجزء اللي فيه اللوت عادة من أول صفحة بس، ولو
+    settings['parse'] ملقتش فيه لوت الصفحة كلها. بترجع (النص، الثواني، الجزء)
+    """
+    start = time.perf_counter()
+    with fitz.open(pdf_path) as doc:
+        if doc.page_count == 0:
+            return '', time.perf_counter() - start, 'empty'
+        page = doc.load_page(0)
+        rect = page.rect
+        x0, y0, x1, y1 = settings['region']
+        clip = fitz.Rect(rect.x0 + rect.width * x0, rect.y0 + rect.height * y0,
+                         rect.x0 + rect.width * x1, rect.y0 + rect.height * y1)
+
+        # الـ rasterize للجزء ده بس مش للصفحة كلها
+        pixmap = page.get_pixmap(dpi=settings['dpi'], clip=clip, colorspace=fitz.csGRAY)
+        text = ocr_pixmap(pixmap, settings['language'])
+        if settings['parse'](text):
+            return text, time.perf_counter() - start, 'region'
+
+        pixmap = page.get_pixmap(dpi=settings['dpi'], colorspace=fitz.csGRAY)
+        text = ocr_pixmap(pixmap, settings['language'])
+        return text, time.perf_counter() - start, 'page'
+
+
+class OcrReader(PdfTextReader):
+    """
+    نفس PdfTextReader (pool، timeout، كاش بالـ hash) بس الشغل OCR. الـ pool
+    بعدد الـ cores لو workers = 0، وكل ملف وقته بيتسجل.
+    """
+
+    label = 'OCR'
+
+    def __init__(self, parse_text, tesseract_cmd, worker_parse, dpi=300, region=DEFAULT_REGION,
+                 language='eng', workers=0, timeout=120, cache_size=1024):
+        super().__init__(parse_text, workers=workers or os.cpu_count() or 1,
+                         timeout=timeout, cache_size=cache_size)
+        self.tesseract_cmd = tesseract_cmd
+        # worker_parse لازم تكون function على مستوى module عشان تتبعت للـ workers
+        self.settings = {'dpi': dpi, 'region': tuple(region), 'language': language, 'parse': worker_parse}
+        self.stats.update({'seconds': 0.0, 'max_seconds': 0.0, 'full_page': 0})
+
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = WorkerPool(self.workers, self.timeout, initializer=init_ocr_worker,
+                                   initargs=(self.tesseract_cmd,))
+        return self.pool
+
+    def start_job(self, path):
+        return self.get_pool().submit(ocr_first_page, path, self.settings)
+
+    def job_text(self, path, value):
+        text, seconds, region = value
+        self.stats['seconds'] += seconds
+        self.stats['max_seconds'] = max(self.stats['max_seconds'], seconds)
+        if region == 'page':
+            self.stats['full_page'] += 1
+        logger.info(f"OCR {os.path.basename(path)}: {seconds:.2f}s ({region})")
+        return text
@@ -0,0 +1,83 @@
+# overlay_stamp.py - صفحة التعليق (الخلفية الرمادية والنص) مترسومة مرة واحدة لكل نص
+import io
+from collections import OrderedDict
+
+from PyPDF2 import PdfReader
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase import pdfmetrics
+
+# أعلى يمين الصفحة
+X_RIGHT = 580
+Y_POSITION = 820
+PADDING = 10
+BOX_HEIGHT = 30
+
+
+def render_overlay(text, font, size, background, color, page_box):
+    """PDF صفحة واحدة فيها التعليق بس (الخط subset جواه) - bytes"""
+    packet = io.BytesIO()
+    can = canvas.Canvas(packet, pagesize=page_box)
+    can.setFont(font, size)
+
+    # حساب عرض النص
+    try:
+        text_width = pdfmetrics.stringWidth(text, font, size)
+    except Exception:
+        text_width = len(text) * 10
+
+    # خلفية رمادية
+    can.setFillColorRGB(*background)
+    can.rect(X_RIGHT - text_width - PADDING * 2, Y_POSITION - 5,
+             text_width + PADDING * 2, BOX_HEIGHT, fill=1, stroke=0)
+
+    # النص بالأسود
+    can.setFillColorRGB(*color)
+    can.drawRightString(X_RIGHT - PADDING, Y_POSITION, text)
+
+    can.save()
+    return packet.getvalue()
+
+
+class OverlayCache:
+    """
+    صفحات التعليق المترسومة بالـ (النص بعد التشكيل، الخط، الحجم، الألوان،
+    مقاس الصفحة). الشهادات اللي ليها نفس النص (شحنات متقسمة من نفس المورد)
+    بتاخد نفس الصفحة من غير canvas جديد ولا تضمين الخط تاني. LRU محدود.
+
+    pdf_bytes للـ incremental stamp (PyMuPDF) و page للدمج بـ PyPDF2 - الصفحة
+    بتتقري من الـ bytes مرة واحدة بس.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, text, font, size, background, color, page_box):
+        key = (text, font, size, tuple(background), tuple(color), tuple(page_box))
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry
+
+        self.stats['misses'] += 1
+        entry = {'pdf': render_overlay(text, font, size, background, color, page_box), 'page': None}
+        if self.max_size:
+            self.entries[key] = entry
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return entry
+
+    def pdf_bytes(self, *style):
+        return self.get(*style)['pdf']
+
+    def page(self, *style):
+        entry = self.get(*style)
+        if entry['page'] is None:
+            entry['page'] = PdfReader(io.BytesIO(entry['pdf'])).pages[0]
+        return entry['page']
+
+    def hit_rate(self):
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
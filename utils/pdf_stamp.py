@@ -0,0 +1,56 @@
+# pdf_stamp.py - كتابة التعليق على الصفحة الأولى بـ incremental update (من غير إعادة كتابة الملف) وملف طباعة الدفعة
+import os
+import shutil
+
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+
+def stamp_incremental(src_path, out_path, overlay_pdf, page_box):
+    """
+    نسخة bytes من الملف وبعدين صفحة التعليق (overlay_pdf من OverlayCache)
+    بتتحط فوق الصفحة الأولى كـ incremental update في آخره: باقي الصفحات والصور
+    مش بتتقري ولا بتتكتب تاني، فالوقت والذاكرة مش بيكبروا مع عدد الصفحات.
+
+    بترجع False لو الملف مينفعش يتعدل incrementally (متشفر أو الـ xref بايظ
+    ومحتاج repair) - وساعتها out_path مش بيفضل موجود.
+    """
+    shutil.copyfile(src_path, out_path)
+    stamped = False
+    try:
+        with fitz.open(out_path) as doc:
+            if doc.page_count and not doc.needs_pass and doc.can_save_incrementally():
+                page = doc.load_page(0)
+                # نفس إحداثيات الـ PDF زي merge_page بتاع PyPDF2 (من تحت، ومن غير rotation)
+                target = fitz.Rect(0, 0, page_box[0], page_box[1]) * page.transformation_matrix
+                with fitz.open('pdf', overlay_pdf) as overlay:
+                    page.show_pdf_page(target, overlay, 0, keep_proportion=False, overlay=True)
+                doc.saveIncr()
+                stamped = True
+    finally:
+        if not stamped:
+            os.remove(out_path)
+    return stamped
+
+
+def merge_pdfs(pdf_paths, out_path):
+    """
+    الملفات ورا بعض في ملف واحد بنفس الترتيب. بترجع (المسارات اللي اتضافت،
+    {المسار: الخطأ}) - الملف البايظ بيتشال من الدفعة بس
+    """
+    included = []
+    errors = {}
+    with fitz.open() as merged:
+        for path in pdf_paths:
+            try:
+                with fitz.open(path) as doc:
+                    merged.insert_pdf(doc)
+                included.append(path)
+            except Exception as e:
+                errors[path] = f"Could not add to print batch: {e}"
+        if included:
+            merged.save(out_path, garbage=1)
+    return included, errors
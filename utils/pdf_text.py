@@ -0,0 +1,125 @@
+# pdf_text.py - قراية نص أول صفحة من الـ PDF في processes منفصلة (لو اسم الملف مفيهوش لوت)
+import logging
+from collections import OrderedDict
+from concurrent.futures import TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.file_utils import FileUtils
+from utils.worker_pool import WorkerPool
+
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+logger = logging.getLogger('CertPrintAgent')
+
+
+def read_first_page_text(pdf_path, max_chars):
+    """شغل الـ worker: نص الصفحة الأولى بس (من غير OCR)"""
+    with fitz.open(pdf_path) as doc:
+        if doc.page_count == 0:
+            return ''
+        return doc.load_page(0).get_text()[:max_chars]
+
+
+class PdfTextReader:
+    """
+    بيقرا نص أول صفحة لكذا PDF في process pool محدود وبيطلع النتايج بترتيب
+    ما بتخلص. parse_text بتتنفذ في الـ process الأساسي على النص، ونتيجتها
+    بتتحفظ بالـ hash بتاع محتوى الملف: نفس الملف (حتى لو اتغير اسمه أو اتجرب
+    تاني) مش بيتفتح غير مرة واحدة.
+    """
+
+    label = 'PDF text'
+
+    def __init__(self, parse_text, workers=2, timeout=30, max_chars=20000, cache_size=1024):
+        self.parse_text = parse_text
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_chars = max_chars
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.pool = None
+        self.stats = {'hits': 0, 'opened': 0, 'errors': 0}
+
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = WorkerPool(self.workers, self.timeout)
+        return self.pool
+
+    def reset_pool(self):
+        """الـ workers بيتقفلوا (حتى لو معلقين في ملف) - pool جديد للدورة الجاية"""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def start_job(self, path):
+        return self.get_pool().submit(read_first_page_text, path, self.max_chars)
+
+    def job_text(self, path, value):
+        """نتيجة الـ worker ← النص اللي parse_text بتشتغل عليه"""
+        return value
+
+    def store(self, key, value):
+        self.cache[key] = value
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def submit(self, paths):
+        """
+        الملفات اللي مش في الكاش بتتبعت للـ pool على طول (القراية بتبدأ في
+        الخلفية) - بترجع jobs لـ collect
+        """
+        jobs = []
+        for path in paths:
+            try:
+                key = FileUtils.get_file_hash(path)
+            except OSError as e:
+                jobs.append((path, None, None, f"Unreadable file: {e}"))
+                continue
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.stats['hits'] += 1
+                jobs.append((path, key, None, None))
+                continue
+            future = self.start_job(path)
+            jobs.append((path, key, future, None))
+        return jobs
+
+    def collect(self, jobs):
+        """بتطلع (path, النتيجة أو None, الخطأ أو None) - اللي في الكاش الأول وبعدين بترتيب ما بتخلص"""
+        pending = {}
+        for path, key, future, error in jobs:
+            if future is not None:
+                pending[future] = (path, key)
+            elif error is not None:
+                yield path, None, error
+            else:
+                yield path, self.cache[key], None
+
+        while pending:
+            # الملف المعلق بس هو اللي بيفشل بالـ timeout - اللي كان مستني وراه بيكمل في pool جديد
+            for future in self.pool.wait(pending):
+                path, key = pending.pop(future)
+                try:
+                    text = future.result()
+                except TimeoutError:
+                    self.stats['errors'] += 1
+                    yield path, None, f"{self.label} read timed out after {self.timeout}s"
+                    continue
+                except BrokenProcessPool as e:
+                    self.stats['errors'] += 1
+                    yield path, None, f"{self.label} worker crashed: {e}"
+                    continue
+                except Exception as e:
+                    # مش بيتحفظ في الكاش: ممكن الملف لسه بيتكتب
+                    self.stats['errors'] += 1
+                    yield path, None, f"{self.label} read failed: {e}"
+                    continue
+                self.stats['opened'] += 1
+                result = self.parse_text(self.job_text(path, text))
+                self.store(key, result)
+                yield path, result, None
@@ -0,0 +1,292 @@
+# print_queue.py - طابور الطباعة في SQLite و thread بيطبع منه (الطباعة مش بتوقف باقي الشهادات)
+import os
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger('CertPrintAgent')
+
+HELD = 'held'
+QUEUED = 'queued'
+PRINTING = 'printing'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class PrinterUnavailable(Exception):
+    """الطابعة نفسها مش موجودة - مش غلطة الأمر، فمش بتتحسب من محاولاته"""
+
+
+class PrintQueue:
+    """
+    أوامر الطباعة محفوظة في SQLite: اللي اتحط في الطابور ومتطبعش بيفضل بعد
+    الـ restart. الأمر اللي كان بيتطبع لما البرنامج وقع بيرجع للطابور (طباعة
+    مرتين أحسن من شهادة متطبعتش).
+
+    المسارات بتتحفظ absolute؛ القديمة (relative) بتتقري بالنسبة لـ base_dir
+    مش للـ cwd بتاع التشغيل الجاي (service أو scheduled task).
+
+    الأوامر اللي بتتحط بـ hold (طباعة الدفعة) مش بتتطبع لحد release_held (لما
+    الدفعة تكمل أو في آخر الدورة)، وبعدين بتطلع مترتبة بـ sort_key (المورد واللوت).
+    """
+
+    def __init__(self, db_path, base_dir='.'):
+        self.db_path = db_path
+        self.base_dir = os.path.abspath(base_dir)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS print_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                pdf_path TEXT,
+                cert_number TEXT,
+                status TEXT,
+                attempts INTEGER DEFAULT 0,
+                next_attempt REAL DEFAULT 0,
+                last_error TEXT,
+                created TEXT,
+                updated TEXT,
+                sort_key TEXT DEFAULT ''
+            )
+        """)
+        # قواعد بيانات قبل طباعة الدفعة
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(print_jobs)")]
+        if 'sort_key' not in columns:
+            self.conn.execute("ALTER TABLE print_jobs ADD COLUMN sort_key TEXT DEFAULT ''")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_print_jobs_status ON print_jobs (status, next_attempt)")
+        with self.lock, self.conn:
+            recovered = self.conn.execute(
+                "UPDATE print_jobs SET status = ? WHERE status IN (?, ?)", (QUEUED, PRINTING, HELD)
+            ).rowcount
+        if recovered:
+            logger.warning(f"Print queue: {recovered} job(s) interrupted before printing finished - queued again")
+
+    def now(self):
+        return datetime.now().isoformat(timespec='seconds')
+
+    def resolve(self, pdf_path):
+        return pdf_path if os.path.isabs(pdf_path) else os.path.join(self.base_dir, pdf_path)
+
+    def enqueue(self, pdf_path, cert_number=None, sort_key='', hold=False):
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO print_jobs (pdf_path, cert_number, status, created, updated, sort_key) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(pdf_path), cert_number, HELD if hold else QUEUED, self.now(), self.now(), sort_key)
+            )
+        return cursor.lastrowid
+
+    def release_held(self, min_jobs=1):
+        """أوامر الدفعة جاهزة للطباعة - لو عددها min_jobs على الأقل"""
+        with self.lock, self.conn:
+            held = self.conn.execute("SELECT COUNT(*) FROM print_jobs WHERE status = ?", (HELD,)).fetchone()[0]
+            if held < min_jobs:
+                return 0
+            return self.conn.execute("UPDATE print_jobs SET status = ?, updated = ? WHERE status = ?",
+                                     (QUEUED, self.now(), HELD)).rowcount
+
+    def claim(self, limit=1):
+        """
+        الأوامر الجاهزة (وقت المحاولة الجاية جه) - بتتعلم printing. أمر واحد:
+        الأقدم، أكتر من أمر: مترتبين بالمورد واللوت
+        """
+        order = "id" if limit == 1 else "sort_key, id"
+        with self.lock, self.conn:
+            rows = self.conn.execute(
+                "SELECT id, pdf_path, cert_number, attempts FROM print_jobs "
+                f"WHERE status = ? AND next_attempt <= ? ORDER BY {order} LIMIT ?",
+                (QUEUED, time.time(), limit)
+            ).fetchall()
+            self.conn.executemany("UPDATE print_jobs SET status = ?, updated = ? WHERE id = ?",
+                                  [(PRINTING, self.now(), row[0]) for row in rows])
+        return [{'id': row[0], 'pdf_path': self.resolve(row[1]), 'cert_number': row[2], 'attempts': row[3]} for row in rows]
+
+    def done(self, job_id):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE print_jobs SET status = ?, attempts = attempts + 1, last_error = NULL, "
+                              "updated = ? WHERE id = ?", (DONE, self.now(), job_id))
+
+    def retry(self, job_id, error, delay):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE print_jobs SET status = ?, attempts = attempts + 1, last_error = ?, "
+                              "next_attempt = ?, updated = ? WHERE id = ?",
+                              (QUEUED, error, time.time() + delay, self.now(), job_id))
+
+    def release(self, job_id):
+        """الأمر يرجع للطابور زي ما هو من غير ما يتحسب محاولة"""
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE print_jobs SET status = ?, updated = ? WHERE id = ?",
+                              (QUEUED, self.now(), job_id))
+
+    def fail(self, job_id, error):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE print_jobs SET status = ?, attempts = attempts + 1, last_error = ?, "
+                              "updated = ? WHERE id = ?", (FAILED, error, self.now(), job_id))
+
+    def counts(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM print_jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def next_due(self):
+        """ثواني لحد أقرب أمر في الطابور أو None لو فاضي"""
+        with self.lock:
+            row = self.conn.execute("SELECT MIN(next_attempt) FROM print_jobs WHERE status = ?", (QUEUED,)).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def prune(self, max_age_days):
+        """الأوامر اللي اتطبعت من زمان - الفاشلة بتفضل لحد ما حد يشوفها"""
+        if not max_age_days:
+            return
+        cutoff = datetime.fromtimestamp(time.time() - max_age_days * 86400).isoformat(timespec='seconds')
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM print_jobs WHERE status = ? AND updated < ?", (DONE, cutoff))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class PrintSpooler(threading.Thread):
+    """
+    بيطبع من الطابور واحد واحد بالترتيب. كل أمر بياخد محاولة واحدة في المرة
+    ولو فشل بيرجع للطابور بعد backoff بيتضاعف (والأوامر اللي بعده بتتطبع في
+    الوقت ده)، ولحد max_attempts وبعدين بيتعلم failed. لو الطابعة نفسها
+    مش موجودة الطابور كله بيستنى (بنفس الـ backoff) من غير ما الأوامر تخسر محاولات.
+
+    batch_size > 1: لحد batch_size أمر جاهز بيتبعتوا لـ print_batch مرة واحدة
+    (ملف واحد للطابعة)، وبترجع الملفات اللي اتطبعت فعلاً - كل أمر بياخد نتيجته.
+    """
+
+    def __init__(self, queue, print_pdf, on_printed=None, max_attempts=6,
+                 backoff_seconds=10, max_backoff_seconds=600, poll_seconds=30,
+                 print_batch=None, batch_size=1):
+        super().__init__(name='print-spooler', daemon=True)
+        self.queue = queue
+        self.print_pdf = print_pdf
+        self.on_printed = on_printed
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.poll_seconds = poll_seconds
+        self.print_batch = print_batch
+        self.batch_size = batch_size if print_batch else 1
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.idle = threading.Event()
+        self.stats = {'printed': 0, 'retried': 0, 'failed': 0}
+        self.offline_delay = 0
+
+    def wake(self):
+        self.wakeup.set()
+
+    def stop(self, timeout=None):
+        self.stopping.set()
+        self.wakeup.set()
+        self.join(timeout)
+
+    @property
+    def paused(self):
+        """الطابعة مش موجودة والطابور مستني"""
+        return self.offline_delay > 0
+
+    def wait_idle(self, timeout=None):
+        """
+        لحد ما مفيش أمر جاهز للطباعة (run_once قبل ما يخرج). بترجع False لو
+        الوقت خلص أو الطابعة مش موجودة (مفيش فايدة من الانتظار)
+        """
+        self.idle.clear()
+        if not self.paused:
+            self.wakeup.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.idle.wait(1.0):
+            if self.paused or (deadline is not None and time.monotonic() >= deadline):
+                return False
+        return True
+
+    def run(self):
+        while not self.stopping.is_set():
+            try:
+                jobs = self.queue.claim(self.batch_size)
+            except sqlite3.Error as e:
+                logger.error(f"Print queue error: {e}")
+                jobs = []
+
+            if not jobs:
+                self.idle.set()
+                due = self.queue.next_due()
+                self.wakeup.wait(self.poll_seconds if due is None else min(due, self.poll_seconds))
+                self.wakeup.clear()
+                continue
+
+            self.print_jobs(jobs)
+
+            if self.offline_delay:
+                self.wakeup.wait(self.offline_delay)
+                self.wakeup.clear()
+
+    def print_jobs(self, jobs):
+        ready = []
+        for job in jobs:
+            if os.path.exists(job['pdf_path']):
+                ready.append(job)
+            else:
+                logger.error(f"Print job {job['id']} ({os.path.basename(job['pdf_path'])}): file is gone")
+                self.queue.fail(job['id'], 'File not found')
+                self.stats['failed'] += 1
+        if not ready:
+            return
+
+        attempt = max(job['attempts'] for job in ready) + 1
+        if len(ready) == 1:
+            name = os.path.basename(ready[0]['pdf_path'])
+            logger.info(f"Printing {name} (job {ready[0]['id']}, attempt {attempt}/{self.max_attempts})")
+        else:
+            logger.info(f"Printing {len(ready)} certificate(s) as one job "
+                        f"(jobs {', '.join(str(job['id']) for job in ready)}, attempt {attempt}/{self.max_attempts})")
+
+        errors = {}
+        try:
+            if len(ready) == 1:
+                printed = {ready[0]['pdf_path']} if self.print_pdf(ready[0]['pdf_path']) else set()
+            else:
+                printed, errors = self.print_batch([job['pdf_path'] for job in ready])
+        except PrinterUnavailable as e:
+            for job in ready:
+                self.queue.release(job['id'])
+            self.offline_delay = min(max(self.offline_delay * 2, self.backoff_seconds), self.max_backoff_seconds)
+            logger.warning(f"⚠ {e} - print queue paused for {self.offline_delay:.0f}s")
+            return
+        except Exception as e:
+            printed = set()
+            errors = {job['pdf_path']: str(e) for job in ready}
+        self.offline_delay = 0
+
+        for job in ready:
+            if job['pdf_path'] in printed:
+                self.job_done(job)
+            else:
+                self.job_failed(job, errors.get(job['pdf_path'], 'Print failed'))
+
+    def job_done(self, job):
+        self.queue.done(job['id'])
+        self.stats['printed'] += 1
+        logger.info(f"✓ Printed {os.path.basename(job['pdf_path'])} (certificate {job['cert_number']})")
+        if self.on_printed:
+            self.on_printed(job['pdf_path'])
+
+    def job_failed(self, job, error):
+        name = os.path.basename(job['pdf_path'])
+        attempt = job['attempts'] + 1
+        if attempt >= self.max_attempts:
+            self.queue.fail(job['id'], error)
+            self.stats['failed'] += 1
+            logger.error(f"✗ Giving up on {name} after {attempt} attempt(s): {error} - print it manually")
+        else:
+            delay = min(self.backoff_seconds * 2 ** (attempt - 1), self.max_backoff_seconds)
+            self.queue.retry(job['id'], error, delay)
+            self.stats['retried'] += 1
+            logger.warning(f"⚠ {name}: {error} - retrying in {delay:.0f}s")
@@ -0,0 +1,77 @@
+# product_matcher.py - التعرف على اسم المنتج من اسم الملف
+from collections import deque
+
+# لحد العدد ده البحث بـ in (في C) أسرع من الـ automaton في Python
+AUTOMATON_MIN_PRODUCTS = 128
+
+
+class ProductMatcher:
+    """
+    بيدور على أسماء المنتجات جوه اسم الملف (من غير حساسية للحروف الكبيرة) ولو
+    كذا منتج موجودين بيرجع اللي ترتيبه الأول في الليستة، زي البحث القديم بالظبط.
+
+    الليستة بتتجهز مرة واحدة. لو المنتجات كتير بيتبني Aho-Corasick automaton
+    فالبحث بيبقى لفة واحدة على اسم الملف مهما كان عدد المنتجات.
+    """
+
+    def __init__(self, products):
+        self.products = list(products)
+        self.lowered = [p.lower() for p in self.products]
+        self.use_automaton = len(self.products) >= AUTOMATON_MIN_PRODUCTS
+        if self.use_automaton:
+            self.build_automaton()
+
+    def build_automaton(self):
+        goto = [{}]
+        outputs = [[]]
+        for priority, word in enumerate(self.lowered):
+            state = 0
+            for ch in word:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = goto[state][ch] = len(goto)
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(priority)
+
+        # روابط الفشل بالعرض، وكل state بتورث مخرجات الـ state اللي بتفشل ليها
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0) if state else 0
+                outputs[nxt] = outputs[nxt] + outputs[fail[nxt]]
+
+        self.goto = goto
+        self.fail = fail
+        # أحسن أولوية بتخلص عند كل state
+        self.best = [min(out) if out else None for out in outputs]
+
+    def match(self, text):
+        """اسم المنتج بالشكل اللي في الليستة، أو None"""
+        text = text.lower()
+        if not self.use_automaton:
+            for priority, word in enumerate(self.lowered):
+                if word in text:
+                    return self.products[priority]
+            return None
+
+        goto, fail, best_at = self.goto, self.fail, self.best
+        state = 0
+        best = best_at[0]  # منتج اسمه فاضي بيطابق أي نص
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            priority = best_at[state]
+            if priority is not None and (best is None or priority < best):
+                best = priority
+                if best == 0:
+                    break
+        return self.products[best] if best is not None else None
@@ -0,0 +1,82 @@
+# sheet_ranges.py - نطاقات أرقام اللوت لكل شيت عشان نعرف اللوت ممكن يكون فين
+import bisect
+import logging
+
+logger = logging.getLogger('CertPrintAgent')
+
+
+def lot_number(cert_lot_number):
+    """رقم اللوت كـ int لو كله أرقام (من غير أصفار في البداية)، وإلا None"""
+    key = str(cert_lot_number).strip().lstrip('0')
+    if key.isdecimal() and len(key) <= 18:
+        return int(key)
+    return None
+
+
+class SheetRanges:
+    """
+    لكل شيت مجموعة فترات [من، لحد] بتغطي كل أرقام اللوت الرقمية اللي فيه.
+
+    الأرقام اللي بينها فرق أقل من gap بتتدمج في فترة واحدة، فالفترات دايماً
+    بتغطي كل رقم موجود: لو رقم مش جوه أي فترة في شيت يبقى أكيد مش في الشيت ده.
+    اللوتات اللي فيها حروف أو شرط مالهاش نطاق وبتتدور عادي.
+    """
+
+    def __init__(self, gap=1000):
+        self.gap = gap
+        self.sheets = []
+        self.starts = {}
+        self.ends = {}
+
+    def add_sheet(self, sheet_name, cert_lots):
+        numbers = sorted({n for n in map(lot_number, cert_lots) if n is not None})
+        starts, ends = [], []
+        for n in numbers:
+            if ends and n - ends[-1] <= self.gap:
+                ends[-1] = n
+            else:
+                starts.append(n)
+                ends.append(n)
+        self.sheets.append(sheet_name)
+        self.starts[sheet_name] = starts
+        self.ends[sheet_name] = ends
+
+    def contains(self, sheet_name, number):
+        starts = self.starts[sheet_name]
+        i = bisect.bisect_right(starts, number) - 1
+        return i >= 0 and number <= self.ends[sheet_name][i]
+
+    def route(self, cert_lot_number):
+        """الشيتات اللي ممكن يكون فيها اللوت بالترتيب، أو None لو اللوت مش رقمي"""
+        number = lot_number(cert_lot_number)
+        if number is None:
+            return None
+        return [sheet for sheet in self.sheets if self.contains(sheet, number)]
+
+    def summary(self):
+        parts = []
+        for sheet in self.sheets:
+            starts, ends = self.starts[sheet], self.ends[sheet]
+            if starts:
+                parts.append(f"{sheet}: {starts[0]}-{ends[-1]} ({len(starts)} range(s))")
+            else:
+                parts.append(f"{sheet}: no numeric lots")
+        return ", ".join(parts)
+
+    def to_dict(self):
+        return {
+            'gap': self.gap,
+            'sheets': self.sheets,
+            'starts': self.starts,
+            'ends': self.ends,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return None
+        ranges = cls(data['gap'])
+        ranges.sheets = list(data['sheets'])
+        ranges.starts = data['starts']
+        ranges.ends = data['ends']
+        return ranges
@@ -0,0 +1,189 @@
+# worker_pool.py - process pool بـ timeout لكل شغلانة: الـ worker المعلق أو اللي وقع بيتقتل من غير ما يبوظ الباقي
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger('CertPrintAgent')
+
+
+def terminate_pool(pool, join_seconds=2):
+    """
+    shutdown لوحده مش بيوقف worker معلق في ملف بايظ (والبرنامج مش بيخرج غير
+    لما يخلص) - الـ workers بيتقفلوا بـ terminate ولو فضلوا عايشين kill
+    """
+    processes = list((getattr(pool, '_processes', None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join(join_seconds)
+        if process.is_alive():
+            process.kill()
+            process.join(join_seconds)
+
+
+class WorkerPool:
+    """
+    ProcessPoolExecutor مش بيتبعتله أكتر من workers شغلانة في المرة (الباقي
+    مستني هنا)، فكل شغلانة متبعتة شغالة فعلاً ووقتها بيتحسب من ساعة ما اتبعتت:
+
+    - اللي تعدي timeout بتفشل بـ TimeoutError والـ pool بيتقتل، واللي كان شغال
+      معاها أو لسه مستني بيتبعت لـ pool جديد من غير ما يتحسب عليه فشل.
+    - لو worker وقع واللي كان شغال شغلانة واحدة هي اللي بتفشل بـ
+      BrokenProcessPool، ولو أكتر كل واحدة بتتعاد لوحدها لحد ما السبب يبان.
+
+    النتايج بتتنقل للـ futures اللي submit بترجعها جوه poll/wait بس (في الـ
+    thread اللي بيستخدم الـ pool).
+    """
+
+    def __init__(self, workers, timeout=None, initializer=None, initargs=()):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.initializer = initializer
+        self.initargs = initargs
+        self.executor = None
+        self.waiting = deque()
+        self.running = {}
+        self.submitted = 0
+        self.stats = {'timeouts': 0, 'crashes': 0, 'requeued': 0}
+
+    def submit(self, fn, *args):
+        self.submitted += 1
+        task = {'seq': self.submitted, 'fn': fn, 'args': args, 'future': Future(),
+                'suspect': False, 'started': None}
+        self.waiting.append(task)
+        self.fill()
+        return task['future']
+
+    def fill(self):
+        while self.waiting and len(self.running) < self.workers:
+            task = self.waiting[0]
+            # الشغلانة المشكوك فيها بتشتغل لوحدها عشان لو وقعت تاني يبقى هي السبب
+            if self.running and (task['suspect'] or any(t['suspect'] for t in self.running.values())):
+                return
+            self.waiting.popleft()
+            if task['future'].cancelled():
+                continue
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=self.initializer,
+                                                    initargs=self.initargs)
+            try:
+                real = self.executor.submit(task['fn'], *task['args'])
+            except (BrokenProcessPool, RuntimeError):
+                # worker وقع وهو فاضي - pool جديد
+                self.stop_executor()
+                self.waiting.appendleft(task)
+                continue
+            task['started'] = time.monotonic()
+            self.running[real] = task
+
+    @staticmethod
+    def settle(task, result=None, error=None):
+        future = task['future']
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def deliver(self, real, task):
+        """نتيجة الـ worker للـ future بتاع الشغلانة - False لو الـ pool وقع قبل ما تخلص"""
+        try:
+            result = real.result()
+        except BrokenProcessPool:
+            return False
+        except Exception as e:
+            self.settle(task, error=e)
+            return True
+        self.settle(task, result)
+        return True
+
+    def requeue(self, tasks, suspect=False):
+        """لأول الطابور بنفس ترتيبها"""
+        for task in sorted(tasks, key=lambda t: t['seq'], reverse=True):
+            task['suspect'] = task['suspect'] or suspect
+            self.waiting.appendleft(task)
+        self.stats['requeued'] += len(tasks)
+
+    def leftovers(self):
+        """اللي كان شغال في pool هيتقتل ومخلصش - اللي خلص بياخد نتيجته"""
+        unfinished = [task for real, task in self.running.items() if not (real.done() and self.deliver(real, task))]
+        self.running.clear()
+        return unfinished
+
+    def poll(self):
+        """نتايج اللي خلص والـ timeouts وتشغيل اللي بعده - من غير انتظار"""
+        broken = []
+        for real in [real for real in self.running if real.done()]:
+            task = self.running.pop(real)
+            if not self.deliver(real, task):
+                broken.append(task)
+        if broken:
+            self.crashed(broken)
+        else:
+            self.expire()
+        self.fill()
+
+    def crashed(self, broken):
+        broken += self.leftovers()
+        self.stop_executor()
+        self.stats['crashes'] += 1
+        if len(broken) == 1:
+            self.settle(broken[0], error=BrokenProcessPool("worker process died while running this job"))
+            return
+        logger.warning(f"Worker pool: a worker died with {len(broken)} job(s) running - retrying them one at a time")
+        self.requeue(broken, suspect=True)
+
+    def expire(self):
+        if not self.timeout:
+            return
+        now = time.monotonic()
+        expired = [real for real, task in self.running.items() if now - task['started'] >= self.timeout]
+        if not expired:
+            return
+        for real in expired:
+            task = self.running.pop(real)
+            self.settle(task, error=TimeoutError(f"timed out after {self.timeout}s"))
+        self.stats['timeouts'] += len(expired)
+        others = self.leftovers()
+        self.stop_executor()
+        if others:
+            logger.warning(f"Worker pool: {len(expired)} job(s) timed out - {len(others)} other job(s) restarted")
+            self.requeue(others)
+
+    def next_expiry(self):
+        if not self.timeout or not self.running:
+            return None
+        oldest = min(task['started'] for task in self.running.values())
+        return max(0.0, oldest + self.timeout - time.monotonic())
+
+    def wait(self, futures):
+        """زي wait(FIRST_COMPLETED): لحد ما واحدة على الأقل من futures تخلص - بترجع اللي خلص"""
+        while True:
+            self.poll()
+            done = {future for future in futures if future.done()}
+            if done or not self.running:
+                return done
+            wait(list(self.running), timeout=self.next_expiry(), return_when=FIRST_COMPLETED)
+
+    def result(self, future):
+        while not future.done():
+            self.wait([future])
+        return future.result()
+
+    def stop_executor(self):
+        if self.executor is not None:
+            terminate_pool(self.executor)
+            self.executor = None
+
+    def close(self):
+        """الـ workers بيتقفلوا حتى لو معلقين، واللي لسه مخلصش بيتلغي"""
+        for task in list(self.waiting) + list(self.running.values()):
+            task['future'].cancel()
+        self.waiting.clear()
+        self.running.clear()
+        self.stop_executor()
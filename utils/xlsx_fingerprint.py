@@ -0,0 +1,109 @@
+# xlsx_fingerprint.py - بصمة لكل شيت في ملف xlsx من غير ما نقرا البيانات
+import hashlib
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+class WorkbookFingerprint:
+    """
+    بصمة ملف xlsx: CRC لكل شيت من فهرس الـ zip + digest لجدول النصوص المشتركة.
+
+    الشيت بيعتبر متغيرش لو الـ XML بتاعه زي ما هو والنصوص المشتركة القديمة
+    لسه في نفس أماكنها (Excel بيضيف النصوص الجديدة في الآخر).
+    """
+
+    def __init__(self, sheets, strings_count=0, strings_digest='', prefix_digest=''):
+        self.sheets = sheets
+        self.strings_count = strings_count
+        self.strings_digest = strings_digest
+        # digest لأول N نص، N = عدد النصوص في البصمة القديمة - لمقارنة الـ prefix
+        self.prefix_digest = prefix_digest
+
+    @classmethod
+    def read(cls, excel_path, previous=None):
+        """قراءة البصمة من الـ zip - بترمي BadZipFile لو الملف بيتكتب دلوقتي"""
+        with zipfile.ZipFile(excel_path) as archive:
+            targets = cls._read_relationships(archive)
+
+            sheets = {}
+            workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+            for sheet in workbook.iter(f'{MAIN_NS}sheet'):
+                part = targets.get(sheet.get(f'{REL_NS}id'))
+                if part is None or part not in archive.NameToInfo:
+                    continue
+                info = archive.getinfo(part)
+                sheets[sheet.get('name')] = f"{info.CRC:08x}:{info.file_size}"
+
+            strings_part = targets.get('__shared_strings__')
+            count, digest, prefix = 0, '', ''
+            if strings_part and strings_part in archive.NameToInfo:
+                prefix_at = previous.strings_count if previous else -1
+                count, digest, prefix = cls._digest_strings(archive, strings_part, prefix_at)
+
+        return cls(sheets, count, digest, prefix)
+
+    @staticmethod
+    def _read_relationships(archive):
+        """خريطة r:id -> مسار الشيت جوه الـ zip"""
+        targets = {}
+        rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+        for rel in rels.iter(f'{PKG_REL_NS}Relationship'):
+            target = rel.get('Target', '')
+            if target.startswith('/'):
+                part = target.lstrip('/')
+            else:
+                part = posixpath.normpath(posixpath.join('xl', target))
+            if rel.get('Type', '').endswith('/sharedStrings'):
+                targets['__shared_strings__'] = part
+            else:
+                targets[rel.get('Id')] = part
+        return targets
+
+    @staticmethod
+    def _digest_strings(archive, part, prefix_at):
+        digest = hashlib.sha1()
+        prefix = ''
+        count = 0
+        with archive.open(part) as f:
+            for _, elem in ET.iterparse(f):
+                if elem.tag != f'{MAIN_NS}si':
+                    continue
+                digest.update(ET.tostring(elem))
+                digest.update(b'\0')
+                elem.clear()
+                count += 1
+                if count == prefix_at:
+                    prefix = digest.hexdigest()
+        return count, digest.hexdigest(), prefix
+
+    def changed_sheets(self, previous, sheet_names):
+        """الشيتات اللي محتاجة تتقري تاني مقارنة بالبصمة القديمة"""
+        if previous is None:
+            return list(sheet_names)
+
+        strings_stable = previous.strings_count == 0 or (
+            self.strings_count >= previous.strings_count
+            and self.prefix_digest == previous.strings_digest
+        )
+        return [
+            name for name in sheet_names
+            if not strings_stable or self.sheets.get(name) != previous.sheets.get(name)
+        ]
+
+    def to_dict(self):
+        return {
+            'sheets': self.sheets,
+            'strings_count': self.strings_count,
+            'strings_digest': self.strings_digest,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return None
+        return cls(data.get('sheets', {}), data.get('strings_count', 0), data.get('strings_digest', ''))
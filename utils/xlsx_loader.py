@@ -0,0 +1,139 @@
+# xlsx_loader.py - قراءة الأعمدة المطلوبة بس من ملف ERP في لفة واحدة
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+from pandas.io.parsers import TextParser
+
+logger = logging.getLogger('CertPrintAgent')
+
+# تحت الحجم ده فتح processes بياخد وقت أكتر من القراءة نفسها
+PARALLEL_MIN_BYTES = 2 * 1024 * 1024
+
+
+def convert_cell(value):
+    """نفس تحويل pandas لقيمة الخلية (OpenpyxlReader._convert_cell)"""
+    if value is None:
+        return ""
+    if isinstance(value, str) and value in ERROR_CODES:
+        return np.nan
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def read_sheet(workbook, sheet_name, column_names):
+    """
+    قراءة شيت واحد من workbook مفتوح - بترجع (cert_lots, suppliers, internal_lots) أو None
+
+    الصفوف بتتقري stream والأعمدة التلاتة بس هي اللي بتتحول، وبعدين بتعدي على
+    TextParser بتاع pandas عشان الأنواع والـ NaN يطلعوا زي pd.read_excel بالظبط.
+    """
+    if sheet_name not in workbook.sheetnames:
+        logger.warning(f"Sheet {sheet_name} not found in workbook")
+        return None
+
+    ws = workbook[sheet_name]
+    ws.reset_dimensions()
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, None) or ()
+    header = [str(h).strip() if h is not None else '' for h in header]
+
+    cert_col = column_names.get('cert_lot', 'NO')
+    supplier_col = column_names.get('supplier', 'Supplier')
+    internal_col = column_names.get('internal_lot', 'Lot Num.')
+    wanted = [cert_col, supplier_col, internal_col]
+
+    missing = [col for col in wanted if col not in header]
+    if missing:
+        logger.warning(f"Missing columns in {sheet_name}: {missing}")
+        return None
+
+    positions = [header.index(col) for col in wanted]
+    data = []
+    last_row_with_data = -1
+
+    for row_number, row in enumerate(rows):
+        if any(v is not None for v in row):
+            last_row_with_data = row_number
+        data.append([convert_cell(row[i]) if i < len(row) else "" for i in positions])
+
+    # زي pandas: الصفوف الفاضية في الآخر بتتشال
+    data = data[: last_row_with_data + 1]
+
+    # زي read_excel (skip_blank_lines=False): الصف الفاضي في النص بيفضل عشان ترتيب الصفوف ميتغيرش
+    df = TextParser([wanted] + data, header=0, skip_blank_lines=False).read()
+    return (
+        df[cert_col].astype(str).str.strip().str.replace('.0', '', regex=False).tolist(),
+        df[supplier_col].astype(str).tolist(),
+        df[internal_col].astype(str).tolist()
+    )
+
+
+def _read_sheet_job(excel_path, sheet_name, column_names):
+    """شغل الـ worker: كل process بيفتح الملف read-only ويقرا شيت واحد"""
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        return sheet_name, read_sheet(workbook, sheet_name, column_names)
+    finally:
+        workbook.close()
+
+
+class WorkbookColumnLoader:
+    """
+    بيفتح ملف الإكسيل مرة واحدة read-only ويقرا الشيتات المطلوبة صف صف،
+    ومش بيحتفظ غير بالأعمدة التلاتة اللي في excel.columns.
+    """
+
+    def __init__(self, excel_path, column_names, workers=0):
+        self.excel_path = excel_path
+        self.column_names = column_names
+        self.workers = workers
+
+    def worker_count(self, sheet_count):
+        if self.workers:
+            return max(1, min(self.workers, sheet_count))
+        # auto: parallel بس للملفات الكبيرة
+        if os.path.getsize(self.excel_path) < PARALLEL_MIN_BYTES:
+            return 1
+        return max(1, min(sheet_count, os.cpu_count() or 1))
+
+    def load(self, sheet_names):
+        """بترجع {sheet: (cert_lots, suppliers, internal_lots) أو None}"""
+        sheet_names = list(sheet_names)
+        if not sheet_names:
+            return {}
+
+        start = time.perf_counter()
+        workers = self.worker_count(len(sheet_names))
+
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(_read_sheet_job, self.excel_path, name, self.column_names)
+                    for name in sheet_names
+                ]
+                results = dict(f.result() for f in futures)
+        else:
+            workbook = load_workbook(self.excel_path, read_only=True, data_only=True)
+            try:
+                results = {name: read_sheet(workbook, name, self.column_names) for name in sheet_names}
+            finally:
+                workbook.close()
+
+        elapsed = time.perf_counter() - start
+        total_rows = 0
+        for name in sheet_names:
+            columns = results.get(name)
+            if columns is not None:
+                total_rows += len(columns[0])
+                logger.info(f"Sheet {name} loaded: {len(columns[0])} rows")
+
+        rate = total_rows / elapsed if elapsed > 0 else 0
+        logger.info(f"Workbook read: {total_rows} rows from {len(sheet_names)} sheet(s) in {elapsed:.2f}s "
+                    f"({rate:,.0f} rows/s, {workers} worker(s))")
+        return results